@@ -8,11 +8,23 @@ from wtforms import PasswordField, DateField
 import os
 
 from app import db
-from models.models import User, Role, Section, LectureType, Lecture, Contact, OrderForm, MenuItem, HomeBlock, SeoSettings
+from images.derivatives import process_upload, remove_upload
+from models.models import User, Role, Section, LectureType, Lecture, Contact, OrderForm, MenuItem, HomeBlock, SeoSettings, JobRun, EmailOutbox
 
 # Create admin blueprint
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+class DerivativeImageUploadField(ImageUploadField):
+    """ImageUploadField that also writes resized WebP/JPEG derivatives and removes them with the image"""
+    def _save_file(self, data, filename):
+        filename = super()._save_file(data, filename)
+        process_upload(self._get_path(filename))
+        return filename
+
+    def _delete_file(self, filename):
+        super()._delete_file(filename)
+        remove_upload(self._get_path(filename))
+
 class SecureModelView(ModelView):
     """Base ModelView with security and customizations"""
     def is_accessible(self):
@@ -52,11 +64,11 @@ class SectionAdmin(SecureModelView):
     column_list = ('name', 'slug', 'order', 'is_active')
     column_searchable_list = ('name', 'slug')
     column_filters = ('is_active',)
-    form_excluded_columns = ('lectures',)
+    form_excluded_columns = ('lectures', 'seo_keywords')
 
     # Handle image upload
     form_extra_fields = {
-        'image': ImageUploadField('Image',
+        'image': DerivativeImageUploadField('Image',
                                 base_path=lambda: os.path.join(os.getcwd(), 'static', 'uploads', 'sections'),
                                 url_relative_path='uploads/sections/')
     }
@@ -72,12 +84,13 @@ class LectureAdmin(SecureModelView):
     column_list = ('order','title','slug', 'section', 'lecture_type', 'is_active')
     column_searchable_list = ('title', 'subtitle', 'slug')
     column_filters = ('section', 'lecture_type', 'is_active')
+    form_excluded_columns = ('seo_keywords',)
 
     column_formatters = {}
 
     # Handle image upload and lecturers selection
     form_extra_fields = {
-        'image': ImageUploadField('Image',
+        'image': DerivativeImageUploadField('Image',
                                 base_path=lambda: os.path.join(os.getcwd(), 'static', 'uploads', 'lectures'),
                                 url_relative_path='uploads/lectures/')
     }
@@ -131,7 +144,7 @@ class ContactAdmin(SecureModelView):
 
     # Handle image upload
     form_extra_fields = {
-        'image': ImageUploadField('Image',
+        'image': DerivativeImageUploadField('Image',
                                 base_path=lambda: os.path.join(os.getcwd(), 'static', 'uploads', 'contacts'),
                                 url_relative_path='uploads/contacts/')
     }
@@ -240,7 +253,7 @@ class HomeBlockAdmin(SecureModelView):
 
     # Handle image upload and template selection
     form_extra_fields = {
-        'image': ImageUploadField('Image',
+        'image': DerivativeImageUploadField('Image',
                                 base_path=lambda: os.path.join(os.getcwd(), 'static', 'uploads', 'blocks'),
                                 url_relative_path='uploads/blocks/'),
         'template': Select2Field('Template', choices=lambda: HomeBlockAdmin._get_template_choices(None))
@@ -256,7 +269,7 @@ class UserAdmin(AdminOnlyModelView):
     # Custom form for password handling and avatar upload
     form_extra_fields = {
         'new_password': PasswordField('New Password'),
-        'avatar': ImageUploadField('Avatar',
+        'avatar': DerivativeImageUploadField('Avatar',
                                 base_path=lambda: os.path.join(os.getcwd(), 'static', 'uploads', 'avatars'),
                                 url_relative_path='uploads/avatars/')
     }
@@ -341,6 +354,25 @@ class SeoSettingsAdmin(AdminOnlyModelView):
                 for setting in old_settings:
                     db.session.delete(setting)
 
+class JobRunAdmin(AdminOnlyModelView):
+    """Read-only history of scheduled job runs"""
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_list = ('job_id', 'status', 'started_at', 'duration', 'host')
+    column_filters = ('job_id', 'status')
+    column_default_sort = ('started_at', True)
+
+class EmailOutboxAdmin(AdminOnlyModelView):
+    """Read-only view of queued, sent and dead-lettered emails"""
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_list = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at', 'last_error')
+    column_filters = ('status',)
+    column_searchable_list = ('subject', 'recipients')
+    column_default_sort = ('created_at', True)
+
 def init_admin(app):
     """Initialize the admin interface"""
     admin = Admin(app, name='Biolectures Admin', template_mode='bootstrap4', url='/admin', endpoint='admin_panel')
@@ -356,6 +388,8 @@ def init_admin(app):
     admin.add_view(OrderFormAdmin(OrderForm, db.session, name='Orders'))
     admin.add_view(MenuItemAdmin(MenuItem, db.session, name='Menu Items'))
     admin.add_view(HomeBlockAdmin(HomeBlock, db.session, name='Home Blocks'))
+    admin.add_view(JobRunAdmin(JobRun, db.session, name='Job Runs', category='Settings'))
+    admin.add_view(EmailOutboxAdmin(EmailOutbox, db.session, name='Email Outbox', category='Settings'))
 
     return admin
 
@@ -1,8 +1,5 @@
 import os
 import re
-import spacy
-from langdetect import detect
-import traceback
 from datetime import datetime
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
@@ -19,10 +16,6 @@ migrate = Migrate()
 mail = Mail()
 
 
-# Загружаем spaCy модели один раз
-nlp_ru = spacy.load("ru_core_news_sm")
-nlp_en = spacy.load("en_core_web_sm")
-
 # Function to initialize roles
 def init_roles():
     from models import Role
@@ -120,6 +113,13 @@ def init_auth_menu_items():
         print(f"Error initializing authentication menu items: {str(e)}")
         db.session.rollback()
 
+def init_db():
+    """Create missing tables and seed required rows; safe to run on every deployment"""
+    import models  # Register all tables on db.metadata before create_all
+    db.create_all()
+    init_roles()
+    init_auth_menu_items()
+
 def create_app(config_name=None):
     """Application factory function"""
     if config_name is None:
@@ -133,6 +133,13 @@ def create_app(config_name=None):
 
     app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+    # Compress dynamic responses; precompressed feed and assets pass through untouched
+    if app.config['COMPRESS_ENABLED']:
+        from compression import CompressionMiddleware
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, min_size=app.config['COMPRESS_MIN_SIZE'],
+                                             gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+                                             brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'])
+
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
@@ -146,17 +153,9 @@ def create_app(config_name=None):
     os.makedirs(app.config['UPLOAD_FOLDER_SECTIONS'], exist_ok=True)
     os.makedirs(app.config['UPLOAD_FOLDER_CONTACTS'], exist_ok=True)
 
-    # Initialize database and roles
-    try:
-        with app.app_context():
-            db.create_all()
-            init_roles()
-            init_auth_menu_items()
-
-    except Exception as e:
-        print(f"Error initializing database: {str(e)}")
-        # Continue with application startup even if initialization fails
-        traceback.print_exc()
+    # Register all tables on db.metadata. Creating tables and seeding roles is done
+    # once per deployment by `flask init-db`, so booting a worker touches no database
+    import models
 
     # Register blueprints
     from auth.views import auth_bp
@@ -178,6 +177,22 @@ def create_app(config_name=None):
     from textgen.plugin import textgen_bp
     app.register_blueprint(textgen_bp)
 
+    # Fingerprinted static assets with far-future caching
+    from assets.manifest import init_assets
+    init_assets(app)
+
+    # Deliver the email outbox in the background of serving workers
+    from mail_outbox import init_outbox
+    init_outbox(app)
+
+    # Sample system metrics for /api/monitor in the background, one sampler per host
+    from metrics.sampler import init_metrics
+    init_metrics(app)
+
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
+
 
     @app.errorhandler(404)
     def page_not_found(e):
@@ -191,63 +206,30 @@ def create_app(config_name=None):
     def inject_now():
         return {'now': datetime.now()}
 
+    # Imported here so that menu changes invalidate the cache in every worker
+    from cache.menu import menu_for_session
+
     @app.context_processor
     def inject_menu_items():
         """Inject menu items into all templates"""
         try:
-            # Get all active menu items
-            from models.models import MenuItem
-            menu_items = MenuItem.query.filter_by(is_active=True, parent_id=None).order_by(MenuItem.order).all()
-
-            # Filter admin menu items if user is not admin, editor, or lecturer with admin access
+            # Served from the process-local menu cache, no queries unless the menu changed
             from flask import session
-            if 'is_admin' not in session and 'is_editor' not in session:
-                # Check if user is a lecturer with admin access
-                from models.models import User
-                show_admin = False
-                if 'user_id' in session and 'is_lecturer' in session:
-                    user = User.query.get(session['user_id'])
-                    if user and user.can_access_admin:
-                        show_admin = True
-
-                if not show_admin:
-                    menu_items = [item for item in menu_items if item.name != 'Админ панель']
-
-            return {'menu_items': menu_items}
+            return {'menu_items': menu_for_session(session)}
         except Exception as e:
             print(f"Error injecting menu items: {str(e)}")
             return {'menu_items': []}
 
-    @app.template_filter('commas')
-    def replace_spaces_with_commas(text):
-        if not text:
-            return ''
+    # Responsive <picture> and srcset of uploaded images with their resized derivatives
+    from images.derivatives import image_srcset, responsive_image
+    app.add_template_global(image_srcset)
+    app.add_template_global(responsive_image)
 
-        # Автоопределение языка
-        try:
-            lang = detect(text)
-        except:
-            lang = 'ru'  # fallback по умолчанию
-
-        # Выбор модели
-        nlp = nlp_ru if lang == 'ru' else nlp_en
-        doc = nlp(text)
-
-        # Части речи, которые нужно исключить
-        excluded_pos = {
-            'ADP',  # предлоги
-            'CCONJ',  # сочинительные союзы
-            'SCONJ',  # подчинительные союзы
-            'PRON',  # местоимения
-            'PART',  # частицы (типа бы, же, ли)
-            'DET',  # определители (this, that, etc.)
-            'INTJ'  # междометия
-        }
-
-        # Фильтруем токены
-        words = [token.text for token in doc if token.pos_ not in excluded_pos and token.is_alpha]
-
-        return ', '.join(words)
+    @app.template_filter('commas')
+    def replace_spaces_with_commas(value):
+        """Keywords for a Lecture/Section (persisted) or an ad-hoc string (LRU cached)"""
+        from nlp.keywords import keywords_for
+        return keywords_for(value)
 
     return app
 
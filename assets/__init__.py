@@ -0,0 +1 @@
+# This file makes the assets directory a Python package
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # .br siblings are skipped, clients get gzip
+    brotli = None
+
+# Каталоги static/, файлы которых получают хеш в имени; загрузки пользователей сюда не входят
+ASSET_DIRS = ('css', 'js', 'img')
+
+# Текстовые форматы, для которых имеет смысл хранить сжатые копии
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.ico')
+
+HASH_LENGTH = 12
+
+MANIFEST_NAME = 'manifest.json'
+
+# Хешированные файлы никогда не меняются, поэтому их можно кэшировать на год
+MAX_AGE = 365 * 24 * 3600
+
+# Порядок предпочтения сжатых копий: (Content-Encoding, суффикс файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def hashed_name(path, data):
+    """css/style.css -> css/style.<sha256 prefix>.css"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(static_folder, output_dir, echo=print):
+    """
+    Copy static assets to output_dir under content-hashed names.
+
+    Compressible files also get .gz and .br siblings when they come out
+    smaller than the original. The manifest is written last, so running
+    workers never see names of files that do not exist yet; files that are
+    no longer referenced are removed afterwards. Returns the manifest.
+    """
+    manifest = {}
+    written = {MANIFEST_NAME}
+    original_bytes = compressed_bytes = 0
+
+    for directory in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, directory)):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+
+                target = hashed_name(logical, data)
+                manifest[logical] = target
+                target_path = os.path.join(output_dir, target)
+                if not os.path.exists(target_path):
+                    _write(target_path, data)
+                written.add(target)
+
+                if not name.lower().endswith(COMPRESSIBLE):
+                    continue
+                variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants['.br'] = brotli.compress(data, quality=11)
+                for suffix, compressed in variants.items():
+                    if len(compressed) < len(data):
+                        _write(target_path + suffix, compressed)
+                        written.add(target + suffix)
+                original_bytes += len(data)
+                compressed_bytes += min(len(v) for v in variants.values())
+
+    _write(os.path.join(output_dir, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, '/')
+            if relative not in written:
+                os.remove(os.path.join(root, name))
+
+    if brotli is None:
+        echo("brotli is not installed, only .gz variants were written")
+    echo(f"{len(manifest)} assets fingerprinted; compressible {original_bytes / 1024:.0f} KB -> "
+         f"{compressed_bytes / 1024:.0f} KB")
+    return manifest
+
+
+class AssetManifest:
+    """
+    The manifest of the running build, read once per process.
+
+    In debug mode it is re-read whenever the file changes, so a rebuild
+    during development is picked up without a restart.
+    """
+
+    def __init__(self):
+        self._entries = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _path(self):
+        return os.path.join(current_app.config['ASSETS_DIR'], MANIFEST_NAME)
+
+    def entries(self):
+        if self._entries is not None and not current_app.debug:
+            return self._entries
+        path = self._path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            # Not built: assets are served unhashed by the default static route
+            self._entries, self._mtime = {}, None
+            return self._entries
+        if mtime != self._mtime:
+            with self._lock:
+                with open(path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+                self._mtime = mtime
+        return self._entries
+
+
+manifest = AssetManifest()
+
+
+def asset_url(endpoint, **values):
+    """
+    url_for() that resolves static files to their fingerprinted copies.
+
+    asset_url('static', filename='css/style.css') returns the URL of the
+    hashed file served with far-future caching if the file is in the
+    manifest, and the regular static URL otherwise. Other endpoints are
+    passed to url_for() unchanged.
+    """
+    if endpoint == 'static':
+        hashed = manifest.entries().get(values.get('filename'))
+        if hashed:
+            endpoint, values['filename'] = 'assets', hashed
+    return url_for(endpoint, **values)
+
+
+def serve_asset(filename):
+    """A fingerprinted asset, precompressed in the best encoding the client accepts"""
+    directory = current_app.config['ASSETS_DIR']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding]:
+            path = safe_join(directory, filename + suffix)
+            if path and os.path.isfile(path):
+                response = send_from_directory(directory, filename + suffix, mimetype=mimetype,
+                                               max_age=MAX_AGE)
+                response.content_encoding = encoding
+                break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=MAX_AGE)
+
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    """Register the route of fingerprinted assets and the asset_url template helper"""
+    app.add_url_rule(f"{app.config['ASSETS_URL_PATH']}/<path:filename>", 'assets', serve_asset)
+    app.add_template_global(asset_url)
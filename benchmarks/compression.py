@@ -0,0 +1,116 @@
+"""
+Response compression benchmark: bytes saved and CPU cost per response type.
+
+Seeds a temporary SQLite database with a section of lectures that have
+realistic HTML content, fetches every response type once uncompressed and
+then compresses it the way CompressionMiddleware does:
+
+  lecture page       /lecture/<slug>                    text/html
+  section page       /section/<slug>                    text/html
+  lectures JSON      /lectures_section/<slug>?fields=... application/json
+  sitemap            /sitemap.xml                       application/xml
+
+For each encoding it reports the compressed size and the CPU time spent
+compressing one response. Finally the middleware is timed end to end
+through the test client, identity vs the configured encodings.
+
+Usage:
+    python benchmarks/compression.py [--lectures 60] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+PARAGRAPH = ('<p>Млекопитающие — класс позвоночных животных, основной отличительной особенностью которых '
+             'является вскармливание детёнышей молоком. Лекция рассказывает об эволюции, строении и '
+             'поведении животных, которых можно увидеть в экспозиции Зоологического музея МГУ.</p>\n')
+
+
+def paragraphs(rng, count):
+    """HTML paragraphs of shuffled words, so the text does not compress better than a real one"""
+    words = PARAGRAPH[3:-5].split()
+    return ''.join(f"<p>{' '.join(rng.sample(words, len(words)))}</p>\n" for _ in range(count))
+
+
+def seed(db, lectures):
+    from models.models import Section, Lecture
+
+    rng = random.Random(0)
+    section = Section(name='Млекопитающие', slug='bench-section', description=paragraphs(rng, 1), is_active=True)
+    db.session.add(section)
+    db.session.flush()
+    for i in range(lectures):
+        db.session.add(Lecture(title=f'Лекция {i}', slug=f'bench-lecture-{i}', section_id=section.id,
+                               description=paragraphs(rng, 1)[3:253], content=paragraphs(rng, 10 + i % 20),
+                               is_active=True, order=i))
+    db.session.commit()
+
+
+def cpu_per_call(func, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lectures', type=int, default=60, help='lectures in the seeded section')
+    parser.add_argument('--repeat', type=int, default=200, help='compressions per measurement')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # Configuration is read from the environment when config.py is imported
+    os.environ.update(DATABASE_URL=f'sqlite:///{os.path.join(directory, "bench.db")}', CACHE_DIR=directory,
+                      NLP_ENABLED='false', FLASK_ENV='production', PAGE_CACHE_ENABLED='false',
+                      MAIL_OUTBOX_WORKER='false')
+
+    from app import create_app, db, init_db
+    from compression import brotli, compress
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        seed(db, args.lectures)
+
+    client = app.test_client()
+    responses = (
+        ('lecture page', '/lecture/bench-lecture-15'),
+        ('section page', '/section/bench-section'),
+        ('lectures JSON', '/lectures_section/bench-section?fields=title,description,content,slug&limit=20'),
+        ('sitemap', '/sitemap.xml'),
+    )
+    encodings = [('gzip', {'gzip_level': level}) for level in (1, 6, 9)]
+    if brotli is not None:
+        encodings += [('br', {'brotli_quality': quality}) for quality in (1, 4, 5, 6, 11)]
+    labels = [f"{encoding} {'-' + str(next(iter(options.values())))}" for encoding, options in encodings]
+
+    print(f"{'response':<14} {'bytes':>8}  " + '  '.join(f'{label:>15}' for label in labels))
+    for name, url in responses:
+        body = client.get(url, headers={'Accept-Encoding': 'identity'}).get_data()
+        cells = []
+        for encoding, options in encodings:
+            size = len(compress(body, encoding, **options))
+            cpu = cpu_per_call(lambda: compress(body, encoding, **options), args.repeat)
+            cells.append(f'{size * 100 / len(body):5.1f}% {cpu:5.2f}ms')
+        print(f"{name:<14} {len(body):>8}  " + '  '.join(f'{cell:>15}' for cell in cells))
+
+    print(f"\nEnd to end through the middleware (CPU per request, {args.repeat} requests)")
+    offered = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    for name, url in responses:
+        cells = []
+        for accept in offered:
+            cpu = cpu_per_call(lambda: client.get(url, headers={'Accept-Encoding': accept}).get_data(),
+                               args.repeat)
+            size = len(client.get(url, headers={'Accept-Encoding': accept}).get_data())
+            cells.append(f'{accept} {size:>7} B {cpu:6.2f}ms')
+        print(f"  {name:<14} " + '  '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Local OpenAI-compatible server for load-testing description regeneration.
+
+Answers POST /v1/chat/completions after a configurable latency, reports
+token usage, and can reject a share of requests with 429 + Retry-After to
+exercise the retry path. Prints the request rate it saw when stopped.
+
+Usage:
+    python benchmarks/fake_openai.py [--port 8099] [--latency 0.5] [--error-rate 0.1]
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=test flask regenerate-descriptions --days 0
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+stats = {'requests': 0, 'rejected': 0, 'first': None, 'last': None}
+stats_lock = threading.Lock()
+
+
+def make_handler(latency, error_rate):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            now = time.monotonic()
+            with stats_lock:
+                stats['requests'] += 1
+                stats['first'] = stats['first'] or now
+                stats['last'] = now
+
+            if random.random() < error_rate:
+                with stats_lock:
+                    stats['rejected'] += 1
+                self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                           {'Retry-After': '1'})
+                return
+
+            time.sleep(latency)
+            prompt = ''.join(m.get('content', '') for m in request.get('messages', []))
+            prompt_tokens = len(prompt) // 4
+            text = f"Описание лекции: {prompt[-80:]}"
+            self._send(200, {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': text}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 50,
+                          'total_tokens': prompt_tokens + 50},
+            })
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per completion')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 429')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(args.latency, args.error_rate))
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        span = (stats['last'] or 0) - (stats['first'] or 0)
+        rate = stats['requests'] / span * 60 if span else 0
+        print(f"\n{stats['requests']} requests ({stats['rejected']} rejected), {rate:.0f} requests/min")
+
+
+if __name__ == '__main__':
+    main()
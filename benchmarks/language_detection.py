@@ -0,0 +1,88 @@
+"""
+Micro-benchmark: nlp.language.detect_language vs plain langdetect.detect.
+
+Runs both detectors over the lecture titles and section names stored in the
+database (or over a text file with one title per line) and prints the mean
+time per call and how often the two detectors agree.
+
+Usage:
+    python benchmarks/language_detection.py [--repeat 5] [--titles-file titles.txt]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def load_titles(titles_file=None):
+    if titles_file:
+        with open(titles_file, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    from app import create_app, db
+    from models.models import Lecture, Section
+
+    app = create_app()
+    with app.app_context():
+        titles = [row[0] for row in db.session.query(Lecture.title).all()]
+        titles += [row[0] for row in db.session.query(Section.name).all()]
+    return [t for t in titles if t]
+
+
+def run(name, func, titles, repeat):
+    started = time.perf_counter()
+    results = None
+    for _ in range(repeat):
+        results = [func(t) for t in titles]
+    elapsed = time.perf_counter() - started
+    calls = len(titles) * repeat
+    print(f"{name:<28} {elapsed * 1e6 / calls:10.1f} µs/call  ({calls} calls, {elapsed:.3f}s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='passes over the title list')
+    parser.add_argument('--titles-file', help='read titles from a file instead of the database')
+    args = parser.parse_args()
+
+    from langdetect import detect
+    from nlp.language import cache_info, clear_cache, detect_language, script_language
+
+    titles = load_titles(args.titles_file)
+    if not titles:
+        sys.exit('No titles to benchmark')
+    print(f"{len(titles)} titles, {args.repeat} passes\n")
+
+    def plain_detect(text):
+        try:
+            return detect(text)
+        except Exception:
+            return 'ru'
+
+    baseline = run('langdetect.detect', plain_detect, titles, args.repeat)
+
+    clear_cache()
+    run('detect_language (cold+warm)', detect_language, titles, args.repeat)
+    print(f"{'':<28} cache: {cache_info()}")
+
+    clear_cache()
+    fast = run('detect_language (1st pass)', detect_language, titles, 1)
+    run('detect_language (cached)', detect_language, titles, args.repeat)
+
+    # What matters is which spaCy model a title ends up with: ru or everything else
+    def model(lang):
+        return 'ru' if lang == 'ru' else 'en'
+
+    ambiguous = sum(1 for t in titles if script_language(t) is None)
+    differ = [(t, a, b) for t, a, b in zip(titles, baseline, fast) if model(a) != model(b)]
+    print(f"\nambiguous titles sent to langdetect: {ambiguous}/{len(titles)}")
+    print(f"different model chosen:              {len(differ)}/{len(titles)}")
+    for title, a, b in differ[:10]:
+        print(f"  {title!r}: langdetect={a}, detect_language={b}")
+
+
+if __name__ == '__main__':
+    main()
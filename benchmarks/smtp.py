@@ -0,0 +1,98 @@
+"""
+SMTP benchmark: a connection per message vs the pooled, batched transport.
+
+Starts a local aiosmtpd server (implicit TLS like smtp.mail.ru unless
+--plain is given) and sends N "orders" of two messages each, the way
+send_order_confirmation_email does:
+
+  per-message  mail.send() for every message, a new SMTP session each time
+  pooled       mail_transport.transport.send() with both messages in one batch
+               over the worker's warm connection
+
+Requires aiosmtpd (pip install aiosmtpd) and, for TLS, the openssl binary.
+
+Usage:
+    python benchmarks/smtp.py [--orders 200] [--plain]
+"""
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def self_signed_context(directory):
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=200, help='orders of two messages to send')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--plain', action='store_true', help='plain SMTP instead of implicit TLS')
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+    except ImportError:
+        sys.exit('aiosmtpd is required: pip install aiosmtpd')
+
+    # Configuration is read from the environment when config.py is imported
+    os.environ.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=str(args.port), MAIL_USERNAME='', MAIL_PASSWORD='',
+                      MAIL_DEFAULT_SENDER='bench@localhost', MAIL_POOL_ENABLED='true')
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    os.environ.setdefault('NLP_ENABLED', 'false')
+
+    from app import create_app, mail
+    from mail_transport import transport
+    from utils import build_email
+
+    app = create_app()
+    app.config['MAIL_USE_SSL'] = not args.plain
+    app.config['MAIL_DEBUG'] = False
+    mail.init_app(app)
+
+    with tempfile.TemporaryDirectory() as directory:
+        context = None if args.plain else self_signed_context(directory)
+        controller = Controller(Sink(), hostname='127.0.0.1', port=args.port, ssl_context=context)
+        controller.start()
+        try:
+            with app.app_context():
+                def order(i):
+                    return [build_email(f'Order {i}', [f'user{i}@example.com'], '<p>Спасибо за заказ</p>'),
+                            build_email(f'Order {i}', ['admin@example.com'], '<p>Новый заказ</p>')]
+
+                def per_message(i):
+                    for message in order(i):
+                        mail.send(message)
+
+                def pooled(i):
+                    transport.send(order(i))
+
+                print(f"{args.orders} orders x 2 messages, {'plain SMTP' if args.plain else 'implicit TLS'}\n")
+                for name, send in (('per-message', per_message), ('pooled', pooled)):
+                    started = time.perf_counter()
+                    for i in range(args.orders):
+                        send(i)
+                    elapsed = time.perf_counter() - started
+                    print(f"{name:<12} {elapsed * 1000 / args.orders:8.2f} ms/order  "
+                          f"{args.orders / elapsed:8.1f} orders/s")
+                transport.close()
+                print(f"\npooled transport: {transport.stats()}")
+        finally:
+            controller.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Startup benchmark: how long a fresh worker process needs to build the app.
+
+Each run starts a new Python interpreter (like a gunicorn worker after a
+fork of an unloaded master), times create_app() and counts the SQL
+statements it issued. With --with-init the one-shot seeding from
+`flask init-db` is timed as part of the boot, which is what every worker
+used to do before it was moved out of create_app().
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--with-init]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+WORKER = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+started = time.perf_counter()
+from app import create_app, init_db
+app = create_app()
+boot, boot_statements = time.perf_counter() - started, len(statements)
+if {with_init!r}:
+    with app.app_context():
+        init_db()
+total = time.perf_counter() - started
+print(json.dumps({{'boot': boot, 'boot_statements': boot_statements, 'total': total, 'statements': len(statements)}}))
+"""
+
+
+def run_worker(with_init):
+    code = WORKER.format(root=ROOT, with_init=with_init)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    # Seeding prints progress, the measurement is the last line
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='worker processes to start')
+    parser.add_argument('--with-init', action='store_true', help='also run the init-db seeding in every worker')
+    args = parser.parse_args()
+
+    results = [run_worker(args.with_init) for _ in range(args.runs)]
+    print(f"{args.runs} workers, seeding {'included' if args.with_init else 'skipped'}")
+    for label, key in (('create_app', 'boot'), ('worker ready', 'total')):
+        times = [r[key] * 1000 for r in results]
+        print(f"  {label:<13} mean {statistics.mean(times):8.1f} ms  "
+              f"median {statistics.median(times):8.1f} ms  max {max(times):8.1f} ms")
+    print(f"  SQL statements per worker: {results[-1]['boot_statements']} in create_app, "
+          f"{results[-1]['statements']} in total")
+
+
+if __name__ == '__main__':
+    main()
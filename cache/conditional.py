@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from werkzeug.http import is_resource_modified
+
+from app import db
+from cache import versions
+from cache.menu import MENU_VERSION
+from cache.slugs import slug_criterion
+from images.derivatives import IMAGES_VERSION
+from models.models import Lecture, Section, SeoSettings
+from nlp.keywords import KEYWORDS_VERSION
+
+# Имя версии настроек сайта, которые выводятся на всех страницах
+SETTINGS_VERSION = 'settings'
+
+versions.track(SETTINGS_VERSION, SeoSettings)
+
+# Версии, общие для всех страниц: меню, настройки, уменьшенные копии изображений
+# и пакетный пересчёт ключевых слов, который не меняет updated_at
+GLOBAL_VERSIONS = (MENU_VERSION, SETTINGS_VERSION, IMAGES_VERSION, KEYWORDS_VERSION)
+
+_release = {}
+
+
+def release_version():
+    """
+    (digest, modified) of the deployed templates and asset manifest.
+
+    A deploy that changes the markup or the asset names changes the
+    validators of every page even if no row was updated. Computed once per
+    process, or on every call in debug mode.
+    """
+    if _release and not current_app.debug:
+        return _release['version']
+
+    digest = hashlib.sha1()
+    modified = 0
+    template_dir = os.path.join(current_app.root_path, current_app.template_folder)
+    paths = [os.path.join(root, name) for root, _, files in os.walk(template_dir) for name in files]
+    paths.append(os.path.join(current_app.config['ASSETS_DIR'], 'manifest.json'))
+    for path in sorted(paths):
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+            modified = max(modified, os.path.getmtime(path))
+        except FileNotFoundError:
+            continue
+
+    _release['version'] = (digest.hexdigest(), datetime.fromtimestamp(modified, timezone.utc))
+    return _release['version']
+
+
+def _section_lectures(section_id):
+    """Newest update and number of the active lectures of a section, as correlated subqueries"""
+    lecture = aliased(Lecture)
+    where = (lecture.section_id == section_id, lecture.is_active == True)
+    return (select(func.max(lecture.updated_at)).where(*where).scalar_subquery(),
+            select(func.count(lecture.id)).where(*where).scalar_subquery())
+
+
+def _lookup_slug(slug):
+    """The slug the view looks up, None for mixed-case slugs the view redirects"""
+    if slug != slug.lower():
+        return None
+    return slug.encode('ascii', 'ignore').decode('ascii')
+
+
+def lecture_state(slug):
+    """Everything the lecture page shows that can change, in one query; None if there is no such lecture"""
+    slug = _lookup_slug(slug)
+    if slug is None:
+        return None
+    newest, count = _section_lectures(Lecture.section_id)
+    return db.session.query(Lecture.id, Lecture.updated_at, Section.updated_at, newest, count).outerjoin(
+        Section, Section.id == Lecture.section_id
+    ).filter(
+        slug_criterion(Lecture, slug),
+        Lecture.is_active == True
+    ).first()
+
+
+def section_state(slug):
+    """Everything the section page shows that can change, in one query; None if there is no such section"""
+    slug = _lookup_slug(slug)
+    if slug is None:
+        return None
+    newest, count = _section_lectures(Section.id)
+    return db.session.query(Section.id, Section.updated_at, newest, count).filter(
+        slug_criterion(Section, slug),
+        Section.is_active == True
+    ).first()
+
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def page_validators(state):
+    """
+    (etag, last_modified) of a page from its database state.
+
+    The ETag also covers the global versions, the release and the session
+    flags the layout depends on; Last-Modified is the newest of the
+    timestamps, so clients that only send If-Modified-Since see global
+    changes too.
+    """
+    global_versions = [versions.get(name) for name in GLOBAL_VERSIONS]
+    release, released = release_version()
+    viewer = ('user_id' in session, bool(session.get('is_admin')), bool(session.get('is_editor')))
+
+    key = json.dumps([[str(value) for value in state], global_versions, release, viewer])
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    timestamps = [_as_utc(value) for value in state if isinstance(value, datetime)]
+    timestamps += [datetime.fromtimestamp(version / 1e9, timezone.utc) for version in global_versions if version]
+    timestamps.append(released)
+    return etag, max(timestamps)
+
+
+def conditional_page(load_state):
+    """
+    Answer conditional GETs of a page with 304 before the view renders it.
+
+    load_state(**view_kwargs) returns the row the page is derived from, or
+    None to let the view handle the request (redirects, 404). Pages with
+    pending flash messages are always rendered. Full responses get the same
+    ETag and Last-Modified and Cache-Control: no-cache, so browsers
+    revalidate on every visit.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            try:
+                state = load_state(**kwargs)
+            except Exception as e:
+                current_app.logger.error(f"Error loading page validators: {e}")
+                db.session.rollback()
+                state = None
+            if state is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = page_validators(state)
+            if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+                response = current_app.response_class(status=304)
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,62 @@
+import threading
+from collections import namedtuple
+
+from app import db
+from cache import versions
+from models.models import MenuItem
+
+# Имя версии, которая сбрасывается при изменении пунктов меню
+MENU_VERSION = 'menu'
+
+versions.track(MENU_VERSION, MenuItem)
+
+# Название пункта меню, который видят только администраторы и редакторы
+ADMIN_MENU_ITEM = 'Админ панель'
+
+# Immutable, session-independent copy of a menu item that is safe to share between requests
+MenuNode = namedtuple('MenuNode', ['id', 'name', 'url', 'order', 'parent_id', 'children'])
+
+_cached = {'version': None, 'tree': ()}
+_lock = threading.Lock()
+
+
+def load_menu_tree():
+    """Load all active menu items in one query and assemble the tree in Python"""
+    rows = (db.session.query(MenuItem.id, MenuItem.name, MenuItem.url, MenuItem.order, MenuItem.parent_id)
+            .filter(MenuItem.is_active == True)
+            .order_by(MenuItem.order, MenuItem.id)
+            .all())
+
+    children = {}
+    for row in rows:
+        children.setdefault(row.parent_id, []).append(row)
+
+    def build(parent_id):
+        return tuple(
+            MenuNode(row.id, row.name, row.url, row.order, row.parent_id, build(row.id))
+            for row in children.get(parent_id, ())
+        )
+
+    return build(None)
+
+
+def get_menu_tree():
+    """Top-level menu items of the current menu version, loaded at most once per change"""
+    version = versions.get(MENU_VERSION)
+    if _cached['version'] == version:
+        return _cached['tree']
+
+    with _lock:
+        if _cached['version'] != version:
+            tree = load_menu_tree()
+            _cached.update(version=version, tree=tree)
+        return _cached['tree']
+
+
+def menu_for_session(session):
+    """Menu tree for the current visitor, filtered by session role flags only"""
+    tree = get_menu_tree()
+    # Lecturers with admin panel access get is_editor at login
+    if session.get('is_admin') or session.get('is_editor'):
+        return tree
+    return tuple(item for item in tree if item.name != ADMIN_MENU_ITEM)
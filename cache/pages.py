@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+from cache import versions
+from images.derivatives import IMAGES_VERSION
+from models.models import Section, LectureType, Lecture, Contact, MenuItem, HomeBlock, SeoSettings
+
+# Имя версии контента: любое изменение публичных данных сбрасывает все страницы
+CONTENT_VERSION = 'content'
+
+versions.track(CONTENT_VERSION, Section, LectureType, Lecture, Contact, MenuItem, HomeBlock, SeoSettings)
+
+CachedPage = namedtuple('CachedPage', ['version', 'body', 'status', 'headers'])
+
+# Заголовки ответа, которые сохраняются вместе со страницей
+_KEPT_HEADERS = ('Content-Type', 'Content-Language')
+
+
+class PageCache:
+    """Bounded per-process LRU of rendered pages with hit/miss counters"""
+
+    def __init__(self):
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None or page.version != version:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def set(self, key, page, maxsize):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > maxsize:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+page_cache = PageCache()
+
+
+def _cacheable_request():
+    """Only anonymous GETs without pending flash messages share cached pages"""
+    return (
+        current_app.config.get('PAGE_CACHE_ENABLED')
+        and request.method == 'GET'
+        and 'user_id' not in session
+        and '_flashes' not in session
+    )
+
+
+def cached_page(view):
+    """
+    Serve a view from the page cache for anonymous visitors.
+
+    Pages are keyed by host, path and query string and stay valid until the
+    next commit that touches public content bumps the content version, or
+    until image derivatives change the srcset markup.
+    Logged-in users always get a fresh render.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        if not _cacheable_request():
+            page_cache.bypass()
+            return view(*args, **kwargs)
+
+        key = f'{request.host}{request.full_path}'
+        # The version is read before rendering so a concurrent change is never cached as current
+        version = (versions.get(CONTENT_VERSION), versions.get(IMAGES_VERSION))
+
+        page = page_cache.get(key, version)
+        if page is not None:
+            response = make_response(page.body, page.status, page.headers)
+            response.headers['X-Page-Cache'] = 'HIT'
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough and '_flashes' not in session:
+            headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+            page_cache.set(key, CachedPage(version, response.get_data(), response.status_code, headers),
+                           current_app.config.get('PAGE_CACHE_SIZE', 512))
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+    return decorated_function
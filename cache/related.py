@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from app import db
+from cache import versions
+from models.models import LECTURE_POSITION, Lecture
+
+# Имя версии, которая сбрасывается при изменении лекций
+RELATED_VERSION = 'related'
+
+versions.track(RELATED_VERSION, Lecture)
+
+# Сколько карточек показывать в карусели «Другие лекции в разделе»
+RELATED_LECTURES_LIMIT = 12
+
+# Сколько разделов держать в памяти процесса
+RELATED_CACHE_SIZE = 256
+
+# Lightweight card with only the columns the carousel renders
+RelatedLecture = namedtuple('RelatedLecture', ['id', 'title', 'slug', 'image', 'description'])
+
+_cached = OrderedDict()
+_lock = threading.Lock()
+
+
+def load_section_cards(section_id, limit):
+    """Active lecture cards of a section in one projected query, without content"""
+    rows = (db.session.query(Lecture.id, Lecture.title, Lecture.slug, Lecture.image, Lecture.description)
+            .filter(Lecture.section_id == section_id, Lecture.is_active == True)
+            .order_by(LECTURE_POSITION, Lecture.id)
+            .limit(limit)
+            .all())
+    return tuple(RelatedLecture(*row) for row in rows)
+
+
+def related_lectures(lecture, limit=RELATED_LECTURES_LIMIT):
+    """
+    Up to limit other active lectures from the section of lecture.
+
+    One extra card is loaded per section so that the current lecture can be
+    dropped in Python and the list is shared by every lecture of the section
+    until the next lecture change.
+    """
+    if lecture.section_id is None:
+        return ()
+
+    version = versions.get(RELATED_VERSION)
+    with _lock:
+        entry = _cached.get(lecture.section_id)
+        if entry is not None and entry[0] == version:
+            _cached.move_to_end(lecture.section_id)
+            cards = entry[1]
+        else:
+            cards = None
+
+    if cards is None:
+        cards = load_section_cards(lecture.section_id, limit + 1)
+        with _lock:
+            _cached[lecture.section_id] = (version, cards)
+            _cached.move_to_end(lecture.section_id)
+            while len(_cached) > RELATED_CACHE_SIZE:
+                _cached.popitem(last=False)
+
+    return tuple(card for card in cards if card.id != lecture.id)[:limit]
@@ -0,0 +1,51 @@
+import threading
+
+from flask import current_app
+from sqlalchemy import false, func
+
+from app import db
+from cache import versions
+from models.models import Section, Lecture
+
+# Имя версии, которая сбрасывается при изменении разделов или лекций
+SLUG_VERSION = 'slugs'
+
+versions.track(SLUG_VERSION, Section, Lecture)
+
+_cached = {'version': None, 'maps': {}}
+_lock = threading.Lock()
+
+
+def load_slug_maps():
+    """{table_name: {slug: id}} of all active sections and lectures, two narrow queries"""
+    maps = {}
+    for model in (Section, Lecture):
+        rows = db.session.query(model.slug, model.id).filter(model.is_active == True).all()
+        maps[model.__tablename__] = {slug.lower(): obj_id for slug, obj_id in rows}
+    return maps
+
+
+def get_slug_map(model):
+    """slug -> id map of model for the current slug version"""
+    version = versions.get(SLUG_VERSION)
+    if _cached['version'] != version:
+        with _lock:
+            if _cached['version'] != version:
+                maps = load_slug_maps()
+                _cached.update(version=version, maps=maps)
+    return _cached['maps'][model.__tablename__]
+
+
+def slug_criterion(model, slug):
+    """
+    Filter expression that selects the row of model with slug.
+
+    With SLUG_MAP_ENABLED the slug is resolved in memory and the query becomes
+    a primary key lookup; otherwise it matches lower(slug), which is served
+    by the ix_<table>_slug_lower index.
+    """
+    slug = slug.lower()
+    if current_app.config.get('SLUG_MAP_ENABLED'):
+        obj_id = get_slug_map(model).get(slug)
+        return model.id == obj_id if obj_id is not None else false()
+    return func.lower(model.slug) == slug
@@ -0,0 +1,95 @@
+import os
+import time
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Какие версии кэшей зависят от таблицы: {table_name: {version_name, ...}}
+_tracked = defaultdict(set)
+
+# Кого уведомить после изменения версии: {version_name: [callback, ...]}
+_subscribers = defaultdict(list)
+
+
+def track(name, *models):
+    """Bump version name after every commit that inserts, updates or deletes rows of models"""
+    for model in models:
+        _tracked[model.__tablename__].add(name)
+
+
+def subscribe(name, callback):
+    """Call callback() in the committing process after a commit bumped version name"""
+    _subscribers[name].append(callback)
+
+
+def cache_dir():
+    """Directory shared by all workers of this host for cache files and version stamps"""
+    path = current_app.config['CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _stamp_path(name):
+    return os.path.join(cache_dir(), f'{name}.version')
+
+
+def get(name):
+    """
+    Current version of name.
+
+    A version is the mtime (in ns) of a stamp file, so reading it is a single
+    stat() call and every worker on the host sees the same value. Returns 0
+    if the version has never been bumped.
+    """
+    try:
+        return os.stat(_stamp_path(name)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump(name):
+    """Move version name forward, invalidating everything cached under the old one"""
+    path = _stamp_path(name)
+    with open(path, 'a'):
+        pass
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def _collect_changes(session, flush_context):
+    changed = session.info.setdefault('changed_versions', set())
+    for obj in list(session.new) + list(session.deleted):
+        changed.update(_tracked.get(getattr(obj, '__tablename__', None), ()))
+    for obj in session.dirty:
+        names = _tracked.get(getattr(obj, '__tablename__', None))
+        if names and session.is_modified(obj):
+            changed.update(names)
+
+
+def _bump_changed(session):
+    changed = session.info.pop('changed_versions', None)
+    if not changed or not has_app_context():
+        return
+    for name in changed:
+        try:
+            bump(name)
+        except OSError as e:
+            current_app.logger.error(f"Error bumping cache version {name}: {e}")
+            continue
+
+        for callback in _subscribers.get(name, ()):
+            try:
+                callback()
+            except Exception as e:
+                current_app.logger.error(f"Error in cache version subscriber for {name}: {e}")
+
+
+def _discard_changes(session, *args):
+    session.info.pop('changed_versions', None)
+
+
+event.listen(Session, 'after_flush', _collect_changes)
+event.listen(Session, 'after_commit', _bump_changed)
+event.listen(Session, 'after_rollback', _discard_changes)
@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import click
+
+# Первая ревизия цепочки миграций, которая поставляется с репозиторием
+BASE_REVISION = '3f1a9c2d7b10'
+
+
+def register_commands(app):
+    """Register the application's flask CLI commands"""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables, standard roles and menu items."""
+        from app import init_db
+
+        init_db()
+        click.echo('Database initialized')
+
+    @app.cli.command('repair-migrations')
+    def repair_migrations_command():
+        """Set aside autogenerated revisions and forget database revisions the shipped chain does not know."""
+        import os
+        from alembic.script import ScriptDirectory
+        from sqlalchemy import inspect, text
+        from app import db
+
+        config = app.extensions['migrate'].migrate.get_config()
+        script = ScriptDirectory.from_config(config)
+
+        def root_of(revision):
+            while revision.down_revision:
+                down = revision.down_revision
+                revision = script.get_revision(down[0] if isinstance(down, tuple) else down)
+            return revision.revision
+
+        # Older entrypoints ran `flask db migrate` on every boot; those revisions start their own chain
+        foreign = [revision for revision in script.walk_revisions() if root_of(revision) != BASE_REVISION]
+        if foreign:
+            stale_dir = os.path.join(os.path.dirname(script.versions), 'stale_versions')
+            os.makedirs(stale_dir, exist_ok=True)
+            for revision in foreign:
+                os.replace(revision.path, os.path.join(stale_dir, os.path.basename(revision.path)))
+                click.echo(f"Moved autogenerated revision {revision.revision} to {stale_dir}")
+            script = ScriptDirectory.from_config(config)
+
+        known = {revision.revision for revision in script.walk_revisions()}
+        if 'alembic_version' not in inspect(db.engine).get_table_names():
+            click.echo('Migrations are consistent')
+            return
+        with db.engine.begin() as connection:
+            stored = [row[0] for row in connection.execute(text('SELECT version_num FROM alembic_version'))]
+            stale = [revision for revision in stored if revision not in known]
+            for revision in stale:
+                connection.execute(text('DELETE FROM alembic_version WHERE version_num = :revision'),
+                                   {'revision': revision})
+        if stale:
+            # Every shipped migration checks the schema first, so upgrading replays them safely
+            click.echo(f"Forgot unknown database revisions {', '.join(stale)}; "
+                       f"flask db upgrade will apply the shipped chain")
+        else:
+            click.echo('Migrations are consistent')
+
+    @app.cli.command('deliver-emails')
+    @click.option('--requeue-dead', is_flag=True, help='Give dead-lettered emails another round of attempts first.')
+    def deliver_emails_command(requeue_dead):
+        """Deliver all due emails from the outbox."""
+        from app import db
+        from mail_outbox import deliver_pending
+        from models.models import EmailOutbox
+
+        if requeue_dead:
+            requeued = EmailOutbox.query.filter_by(status='dead').update(
+                {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow()})
+            db.session.commit()
+            click.echo(f"Requeued {requeued} dead emails")
+
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_pending()
+            total_sent, total_failed = total_sent + sent, total_failed + failed
+            if not sent and not failed:
+                break
+        click.echo(f"Sent {total_sent} emails, {total_failed} failed")
+
+    @app.cli.command('extract-keywords')
+    @click.option('--batch-size', default=256, show_default=True, help='Documents per nlp.pipe batch.')
+    @click.option('--n-process', default=1, show_default=True, help='Worker processes for nlp.pipe.')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows read and committed per chunk.')
+    @click.option('--only-missing', is_flag=True, help='Only process rows without keywords.')
+    def extract_keywords_command(batch_size, n_process, chunk_size, only_missing):
+        """Fill seo_keywords for all active lectures and sections."""
+        from nlp.batch import backfill_keywords
+        from nlp.registry import registry
+
+        if not registry.enabled():
+            raise click.ClickException('NLP is disabled (NLP_ENABLED=false)')
+
+        backfill_keywords(batch_size=batch_size, n_process=n_process, chunk_size=chunk_size,
+                          only_missing=only_missing, echo=click.echo)
+
+    @app.cli.command('regenerate-descriptions')
+    @click.option('--days', default=15, show_default=True, help='Regenerate lectures not updated for this many days.')
+    @click.option('--concurrency', type=int, help='Requests in flight (TEXTGEN_CONCURRENCY).')
+    @click.option('--rpm', type=int, help='Requests per minute limit (TEXTGEN_RPM).')
+    @click.option('--tpm', type=int, help='Tokens per minute limit (TEXTGEN_TPM).')
+    @click.option('--batch-size', type=int, help='Descriptions per commit (TEXTGEN_COMMIT_BATCH).')
+    def regenerate_descriptions_command(days, concurrency, rpm, tpm, batch_size):
+        """Regenerate SEO descriptions of stale lectures through the OpenAI API."""
+        from datetime import datetime, timedelta
+        from textgen.bulk import regenerate_descriptions
+
+        regenerate_descriptions(datetime.utcnow() - timedelta(days=days), concurrency=concurrency,
+                                rpm=rpm, tpm=tpm, batch_size=batch_size, echo=click.echo)
+
+    @app.cli.command('build-image-derivatives')
+    @click.option('--folder', 'folders', multiple=True, help='Upload folder to process, e.g. lectures (all by default).')
+    @click.option('--workers', type=int, help='Worker processes (CPU count by default).')
+    @click.option('--force', is_flag=True, help='Rebuild derivatives that are already up to date.')
+    def build_image_derivatives_command(folders, workers, force):
+        """Create resized WebP/JPEG derivatives of all uploaded images."""
+        import time
+        from images.derivatives import backfill
+
+        started = time.perf_counter()
+        images, written, source_bytes, derived_bytes = backfill(list(folders), workers=workers, force=force,
+                                                                echo=click.echo)
+        click.echo(f"{images} images, {written} files written in {time.perf_counter() - started:.1f}s; "
+                   f"originals {source_bytes / 2 ** 20:.1f} MB, largest WebP {derived_bytes / 2 ** 20:.1f} MB")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint static assets into ASSETS_DIR with .gz/.br variants and a manifest."""
+        from assets.manifest import build_assets
+
+        build_assets(app.static_folder, app.config['ASSETS_DIR'], echo=click.echo)
+
+    @app.cli.command('generate-feed')
+    def generate_feed_command():
+        """Regenerate the YML feed (feed.xml) for the current catalog version."""
+        from seo.feed import build_feed, feed_key
+
+        with app.test_request_context(base_url=app.config['FEED_BASE_URL']):
+            path = build_feed(feed_key())
+        click.echo(f"Feed written to {path}")
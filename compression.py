@@ -0,0 +1,186 @@
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_options_header
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered
+    brotli = None
+
+# Типы ответов, которые стоит сжимать; изображения, архивы и видео уже сжаты
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/xml', 'text/javascript',
+    'application/json', 'application/xml', 'application/javascript', 'application/rss+xml', 'image/svg+xml',
+)
+
+# Статусы без тела или с частью тела, которые нельзя перекодировать
+_SKIPPED_STATUSES = (204, 206, 304)
+
+
+class _Encoder:
+    """Incremental gzip or brotli compressor with a common interface"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self.compress, self.flush, self.finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            # wbits 31: deflate stream in a gzip container
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self.compress = compressor.compress
+            self.flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = compressor.flush
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=5):
+    """Compress a whole body the way the middleware does"""
+    encoder = _Encoder(encoding, gzip_level, brotli_quality)
+    return encoder.compress(data) + encoder.finish()
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that compresses responses with brotli or gzip.
+
+    The encoding is negotiated from Accept-Encoding (brotli wins a tie when
+    the brotli package is installed). Responses are compressed when their
+    mimetype is in the allow-list and the body has at least min_size bytes,
+    unless they already carry a Content-Encoding (precompressed feed and
+    assets), are partial or forbid it with Cache-Control: no-transform.
+
+    Bodies are compressed as they are iterated: large bodies are fed to the
+    compressor in chunk_size slices and compressed bytes are sent as they
+    come out; responses without Content-Length (streamed) are flushed after
+    every chunk, so the client receives them as they are produced.
+    """
+
+    def __init__(self, app, min_size=500, mimetypes=DEFAULT_MIMETYPES, gzip_level=6, brotli_quality=5,
+                 use_brotli=True, chunk_size=64 * 1024):
+        self.app = app
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if use_brotli and brotli is not None else ('gzip',)
+        self.chunk_size = chunk_size
+
+    def negotiate(self, accept_encoding):
+        """Best supported encoding the client accepts, None for identity"""
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accepted.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def _compressible(self, status, headers):
+        if int(status.split(' ', 1)[0]) in _SKIPPED_STATUSES or int(status[0]) == 1:
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        if mimetype not in self.mimetypes:
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        started = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+            # Legacy write() output goes before the iterable's chunks
+            return written.append
+
+        result = self.app(environ, capture)
+        iterator = None
+        if not started:
+            # The application starts the response with its first chunk
+            iterator = iter(result)
+            for chunk in iterator:
+                written.append(chunk)
+                if started:
+                    break
+            else:
+                if not started:
+                    if hasattr(result, 'close'):
+                        result.close()
+                    raise RuntimeError('The application returned without calling start_response')
+
+        status, header_list, exc_info = started
+        headers = Headers(header_list)
+        if not self._compressible(status, headers):
+            start_response(status, header_list, exc_info)
+            if iterator is None and not written:
+                # Untouched, so file responses keep wsgi.file_wrapper (sendfile)
+                return result
+            return self._chain(written, iterator if iterator is not None else iter(result), result)
+
+        if iterator is None:
+            iterator = iter(result)
+        streamed = 'Content-Length' not in headers
+        if streamed:
+            # Read ahead up to min_size to skip compressing small streamed bodies
+            size = sum(len(chunk) for chunk in written)
+            if size < self.min_size:
+                for chunk in iterator:
+                    written.append(chunk)
+                    size += len(chunk)
+                    if size >= self.min_size:
+                        break
+                else:
+                    start_response(status, header_list, exc_info)
+                    return self._chain(written, iterator, result)
+
+        del headers['Content-Length']
+        headers['Content-Encoding'] = encoding
+        vary = headers.get('Vary')
+        if not vary:
+            headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            headers['Vary'] = f'{vary}, Accept-Encoding'
+        # The compressed body is not byte-identical to the one a strong ETag describes
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = f'W/{etag}'
+
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return self._compress(encoding, written, iterator, result, streamed)
+
+    @staticmethod
+    def _chain(first, iterator, result):
+        try:
+            yield from first
+            yield from iterator
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    def _compress(self, encoding, first, iterator, result, streamed):
+        encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+        try:
+            for source in (first, iterator):
+                for chunk in source:
+                    for start in range(0, len(chunk), self.chunk_size):
+                        data = encoder.compress(chunk[start:start + self.chunk_size])
+                        if data:
+                            yield data
+                    if streamed and chunk:
+                        data = encoder.flush()
+                        if data:
+                            yield data
+            yield encoder.finish()
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 
+from db_pool import engine_options
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -17,6 +19,25 @@ class Config:
     UPLOAD_FOLDER_SECTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads', 'sections')
     UPLOAD_FOLDER_CONTACTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads', 'contacts')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+    # Fingerprinted copies of static/css, js and img written by `flask build-assets`
+    ASSETS_DIR = os.environ.get('ASSETS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'dist'))
+    ASSETS_URL_PATH = '/assets'
+    # Brotli/gzip compression of HTML, JSON and XML responses (compression.py)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))  # Bytes; smaller bodies are sent as is
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))  # 0-11, 5 costs about as much CPU as gzip -6
+    # Resized WebP/JPEG copies of uploaded images, served through srcset
+    IMAGE_DERIVATIVE_WIDTHS = tuple(int(w) for w in os.environ.get('IMAGE_DERIVATIVE_WIDTHS', '320,640,960,1280').split(','))
+    IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', 80))
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 82))
+    # Directory for generated files (sitemap, feeds) and cache version stamps, shared by all workers
+    CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'cache'))
+    # Full-page cache of public pages for anonymous visitors (opt-in)
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'false').lower() in ('true', '1', 'yes')
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 512))  # Pages kept per worker
+    # Per-worker slug -> id map for sections and lectures, reloaded after slug changes (opt-in)
+    SLUG_MAP_ENABLED = os.environ.get('SLUG_MAP_ENABLED', 'false').lower() in ('true', '1', 'yes')
 
     # Email configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.mail.ru')
@@ -28,10 +49,45 @@ class Config:
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'MAIL_DEFAULT_SENDER')
     MAIL_MAX_EMAILS = None
     MAIL_ASCII_ATTACHMENTS = False
+    # Keep one SMTP connection per worker open between messages
+    MAIL_POOL_ENABLED = os.environ.get('MAIL_POOL_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    MAIL_POOL_PING_AFTER = int(os.environ.get('MAIL_POOL_PING_AFTER', 10))  # Seconds idle before a NOOP check
+    MAIL_POOL_IDLE_TIMEOUT = int(os.environ.get('MAIL_POOL_IDLE_TIMEOUT', 120))  # Seconds idle before reconnecting
+    # Email outbox: order and contact emails are queued in the database and delivered in the background
+    MAIL_OUTBOX_WORKER = os.environ.get('MAIL_OUTBOX_WORKER', 'true').lower() in ('true', '1', 'yes')
+    MAIL_OUTBOX_POLL_INTERVAL = int(os.environ.get('MAIL_OUTBOX_POLL_INTERVAL', 30))  # Seconds between retry scans
+    MAIL_OUTBOX_BATCH = int(os.environ.get('MAIL_OUTBOX_BATCH', 20))  # Emails claimed per delivery run
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 8))  # Then the email is dead-lettered
+    MAIL_OUTBOX_RETRY_BASE = int(os.environ.get('MAIL_OUTBOX_RETRY_BASE', 60))  # Seconds, doubled after each failure
+    # System metrics for the admin monitor, sampled by one thread per host (metrics/sampler.py)
+    METRICS_SAMPLER_ENABLED = os.environ.get('METRICS_SAMPLER_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    METRICS_INTERVAL = float(os.environ.get('METRICS_INTERVAL', 2))  # Seconds between samples
+    METRICS_HISTORY = int(os.environ.get('METRICS_HISTORY', 1800))  # Samples kept, one hour at the default interval
+    PROCESS_SNAPSHOT_TTL = float(os.environ.get('PROCESS_SNAPSHOT_TTL', 2))  # Seconds a process list is reused by /api/process
     PREFERRED_URL_SCHEME = 'https'
     # Site configuration
     SITE_NAME = 'Биолекторий МГУ'
     BASE_URL = os.environ.get('BASE_URL')
+    # Absolute site URL used when the YML feed is generated outside of a request
+    FEED_BASE_URL = os.environ.get('FEED_BASE_URL', 'https://biolectures.ru')
+
+    # Bulk regeneration of lecture descriptions through the OpenAI API
+    # (OPENAI_BASE_URL points the client at any OpenAI-compatible server)
+    TEXTGEN_CONCURRENCY = int(os.environ.get('TEXTGEN_CONCURRENCY', 4))  # Requests in flight
+    TEXTGEN_RPM = int(os.environ.get('TEXTGEN_RPM', 500))  # Requests per minute
+    TEXTGEN_TPM = int(os.environ.get('TEXTGEN_TPM', 200000))  # Tokens per minute
+    TEXTGEN_MAX_RETRIES = int(os.environ.get('TEXTGEN_MAX_RETRIES', 5))
+    TEXTGEN_COMMIT_BATCH = int(os.environ.get('TEXTGEN_COMMIT_BATCH', 25))  # Descriptions per commit
+    # Database cache of generated texts
+    TEXTGEN_CACHE_TTL = int(os.environ.get('TEXTGEN_CACHE_TTL', 30 * 24 * 3600))  # Seconds
+    TEXTGEN_CACHE_SIZE = int(os.environ.get('TEXTGEN_CACHE_SIZE', 10000))  # Rows kept
+
+    # NLP configuration: spaCy models are loaded lazily on first use
+    NLP_ENABLED = os.environ.get('NLP_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    NLP_MODELS = {
+        'ru': os.environ.get('NLP_MODEL_RU', 'ru_core_news_sm'),
+        'en': os.environ.get('NLP_MODEL_EN', 'en_core_web_sm'),
+    }
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -40,6 +96,7 @@ class DevelopmentConfig(Config):
 
     # Определение URL базы данных для среды разработки
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(os.environ, SQLALCHEMY_DATABASE_URI, pool_size=2, max_overflow=5)
 
 
 class ProductionConfig(Config):
@@ -49,6 +106,7 @@ class ProductionConfig(Config):
 
     # Определение URL базы данных для продакшн-среды
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(os.environ, SQLALCHEMY_DATABASE_URI, pool_size=10, max_overflow=10)
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class PoolStats:
+    """Checkout wait times and overflow counters of the connection pools in this worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.overflow_checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.overflow_max = 0
+
+    def record(self, wait, overflow, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                if overflow > 0:
+                    self.overflow_checkouts += 1
+                    self.overflow_max = max(self.overflow_max, overflow)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self):
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'overflow_checkouts': self.overflow_checkouts,
+                'overflow_max': self.overflow_max,
+                'timeouts': self.timeouts,
+                'wait_avg_ms': round(self.wait_total / attempts * 1000, 3) if attempts else None,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited and whether it used overflow"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - start, self.overflow(), timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start, self.overflow())
+        return connection
+
+
+def _env_flag(environ, name, default='false'):
+    return environ.get(name, default).lower() in ('true', '1', 'yes')
+
+
+def engine_options(environ, database_uri, pool_size=5, max_overflow=10):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS built from DB_* environment variables.
+
+    pool_size and max_overflow are the defaults of the config class and can be
+    overridden with DB_POOL_SIZE and DB_MAX_OVERFLOW. With DB_PGBOUNCER=true
+    connections are not pooled in the worker at all (PgBouncer does that) and
+    drivers that prepare statements server-side are told not to, because a
+    transaction-pooled backend is not guaranteed to have them.
+    """
+    database_uri = database_uri or ''
+    if not database_uri.startswith('postgresql'):
+        # SQLite and friends keep their dialect defaults
+        return {}
+
+    if _env_flag(environ, 'DB_PGBOUNCER'):
+        options = {'poolclass': NullPool}
+        if database_uri.startswith('postgresql+psycopg:'):
+            options['connect_args'] = {'prepare_threshold': None}
+        elif database_uri.startswith('postgresql+asyncpg:'):
+            options['connect_args'] = {'statement_cache_size': 0}
+        return options
+
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', 30)),
+        # Reconnect before Postgres or a firewall drops an idle connection
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        # Detect connections killed by a Postgres restart before handing them out
+        'pool_pre_ping': _env_flag(environ, 'DB_POOL_PRE_PING', 'true'),
+    }
+
+
+def pool_status(engine):
+    """Current pool occupancy of engine together with the recorded checkout statistics"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    status.update(pool_stats.stats())
+    return status
@@ -18,15 +18,31 @@ else
   echo "Migrations directory already exists, skipping initialization..."
 fi
 
-# Create and apply migrations
-echo "Creating migrations..."
-flask db migrate -m "Auto-migration"
+# Set aside revisions autogenerated by older entrypoints and forget them in alembic_version
+echo "Checking migrations..."
+flask repair-migrations
+
+# Apply migrations shipped in migrations/versions
 echo "Applying migrations..."
 flask db upgrade
 
-# Initialize database with required data
+# Initialize database with required data (tables, roles, menu items) once per deployment
 echo "Initializing database with required data..."
-# python add_auth_menu_items.py
+flask init-db
+
+# SEO keywords of rows saved before keywords were stored; pages never compute them while rendering
+if [[ "${NLP_ENABLED:-true}" =~ ^(true|1|yes)$ ]]; then
+  echo "Extracting missing keywords..."
+  flask extract-keywords --only-missing
+fi
+
+# Content-hashed, precompressed copies of CSS, JS and images
+echo "Building static assets..."
+flask build-assets
+
+# Resized copies of uploaded images; images that already have them are skipped
+echo "Building image derivatives..."
+flask build-image-derivatives
 
 # Start the application
 echo "Starting application..."
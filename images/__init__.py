@@ -0,0 +1 @@
+# This file makes the images directory a Python package
@@ -0,0 +1,244 @@
+import math
+import os
+import threading
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+from PIL import Image, ImageOps
+
+from cache import versions
+
+# Имя версии, которая сбрасывается после создания или удаления производных изображений
+IMAGES_VERSION = 'images'
+
+# Подкаталог папки загрузок с производными изображениями
+DERIVED_DIR = '_derived'
+
+# Расширение файла производного изображения для каждого формата Pillow
+FORMATS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+# Параметры кодировщика сверх качества
+SAVE_OPTIONS = {'WEBP': {'method': 4}, 'JPEG': {'optimize': True, 'progressive': True}}
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+# Ширина карточек лекций и разделов в сетке Bootstrap; по умолчанию для атрибута sizes
+CARD_SIZES = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+_available = {}
+_lock = threading.Lock()
+
+
+def derived_name(filename, width, fmt):
+    """Name of a derivative, e.g. photo.jpg.640w.webp; the full source name keeps photo.jpg and photo.png apart"""
+    return f'{filename}.{width}w.{FORMATS[fmt]}'
+
+
+def target_widths(source_width, widths):
+    """Configured widths narrower than the source, plus the source width capped at the largest one"""
+    targets = [w for w in sorted(widths) if w < source_width]
+    top = min(source_width, max(widths))
+    if top not in targets:
+        targets.append(top)
+    return targets
+
+
+def _flatten(image, fmt):
+    # JPEG has no alpha channel, transparent areas become white
+    if fmt == 'JPEG' and image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    return image
+
+
+def make_derivatives(path, widths, webp_quality=80, jpeg_quality=82, force=False):
+    """
+    Write WebP and JPEG copies of the image at path for each target width.
+
+    Derivatives go to the DERIVED_DIR next to the source and are skipped when
+    they are newer than the source unless force is set. Runs without an app
+    context, so it can be used from a process pool. Returns
+    (source_bytes, derived_bytes, files_written), where derived_bytes is the
+    size of the largest WebP derivative, the one a desktop browser loads.
+    """
+    directory, filename = os.path.split(path)
+    derived_dir = os.path.join(directory, DERIVED_DIR)
+    os.makedirs(derived_dir, exist_ok=True)
+    source_stat = os.stat(path)
+    quality = {'WEBP': webp_quality, 'JPEG': jpeg_quality}
+
+    with Image.open(path) as image:
+        # EXIF orientation swaps the sides of portrait photos
+        source_width = image.height if image.getexif().get(0x0112, 1) in (5, 6, 7, 8) else image.width
+        targets = [(width, fmt, os.path.join(derived_dir, derived_name(filename, width, fmt)))
+                   for width in target_widths(source_width, widths) for fmt in FORMATS]
+
+        def up_to_date(target):
+            try:
+                return os.stat(target).st_mtime_ns >= source_stat.st_mtime_ns
+            except FileNotFoundError:
+                return False
+
+        written = 0
+        if force or not all(up_to_date(target) for _, _, target in targets):
+            # Let the JPEG decoder scale down by a power of two while reading
+            scale = targets[-1][0] / source_width
+            image.draft('RGB', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+            image = ImageOps.exif_transpose(image)
+
+            for width, fmt, target in targets:
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                # Written under a temporary name, so a page never links a half-written file
+                tmp = f'{target}.tmp'
+                _flatten(resized, fmt).save(tmp, fmt, quality=quality[fmt], **SAVE_OPTIONS[fmt])
+                os.replace(tmp, target)
+                written += 1
+
+    largest_webp = os.path.join(derived_dir, derived_name(filename, targets[-1][0], 'WEBP'))
+    return source_stat.st_size, os.path.getsize(largest_webp), written
+
+
+def delete_derivatives(path):
+    """Remove all derivatives of the image at path"""
+    directory, filename = os.path.split(path)
+    derived_dir = os.path.join(directory, DERIVED_DIR)
+    try:
+        names = os.listdir(derived_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.rsplit('.', 2)[0] == filename:
+            try:
+                os.remove(os.path.join(derived_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def _config_args():
+    config = current_app.config
+    return config['IMAGE_DERIVATIVE_WIDTHS'], config['IMAGE_WEBP_QUALITY'], config['IMAGE_JPEG_QUALITY']
+
+
+def process_upload(path):
+    """Create derivatives of a freshly saved upload; an unreadable image keeps only its original"""
+    widths, webp_quality, jpeg_quality = _config_args()
+    try:
+        make_derivatives(path, widths, webp_quality, jpeg_quality, force=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        current_app.logger.warning(f"Error creating derivatives of {path}: {e}")
+        return
+    versions.bump(IMAGES_VERSION)
+
+
+def remove_upload(path):
+    """Delete derivatives of a removed or replaced upload"""
+    delete_derivatives(path)
+    versions.bump(IMAGES_VERSION)
+
+
+def _scan(folder):
+    """{filename: {format: [widths]}} of the derivatives in an upload folder, from a single directory listing"""
+    derived_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], folder, DERIVED_DIR)
+    found = {}
+    try:
+        names = os.listdir(derived_dir)
+    except FileNotFoundError:
+        return found
+    extensions = {ext: fmt for fmt, ext in FORMATS.items()}
+    for name in names:
+        parts = name.rsplit('.', 2)
+        if len(parts) != 3 or parts[2] not in extensions or not parts[1].endswith('w'):
+            continue
+        try:
+            width = int(parts[1][:-1])
+        except ValueError:
+            continue
+        found.setdefault(parts[0], {}).setdefault(extensions[parts[2]], []).append(width)
+    for formats in found.values():
+        for widths in formats.values():
+            widths.sort()
+    return found
+
+
+def available(folder, filename):
+    """{format: [widths]} of derivatives of an upload, listed once per folder until the next upload"""
+    version = versions.get(IMAGES_VERSION)
+    with _lock:
+        entry = _available.get(folder)
+    if entry is None or entry[0] != version:
+        entry = (version, _scan(folder))
+        with _lock:
+            _available[folder] = entry
+    return entry[1].get(filename, {})
+
+
+def image_srcset(folder, filename, fmt='WEBP'):
+    """srcset value with the derivatives of an upload in fmt, empty if there are none"""
+    if not filename:
+        return ''
+    widths = available(folder, filename).get(fmt, ())
+    return ', '.join(
+        f"{url_for('static', filename=f'uploads/{folder}/{DERIVED_DIR}/{derived_name(filename, w, fmt)}')} {w}w"
+        for w in widths)
+
+
+def responsive_image(folder, filename, alt='', sizes=CARD_SIZES, class_=None, loading='lazy'):
+    """
+    <picture> with WebP and JPEG srcsets of an upload and the original as a fallback.
+
+    Images without derivatives (not yet backfilled) render as a plain <img>.
+    """
+    src = url_for('static', filename=f'uploads/{folder}/{filename}')
+    attrs = f' class="{escape(class_)}"' if class_ else ''
+    if loading:
+        attrs += f' loading="{escape(loading)}"'
+    webp, jpeg = image_srcset(folder, filename, 'WEBP'), image_srcset(folder, filename, 'JPEG')
+    if not webp:
+        return Markup(f'<img src="{escape(src)}"{attrs} alt="{escape(alt)}">')
+    return Markup(
+        f'<picture><source type="image/webp" srcset="{escape(webp)}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(src)}" srcset="{escape(jpeg)}" sizes="{escape(sizes)}"{attrs} alt="{escape(alt)}">'
+        f'</picture>')
+
+
+def backfill(folders=None, workers=None, force=False, echo=print):
+    """
+    Create missing derivatives of all uploads with a process pool.
+
+    Image decoding and encoding are CPU bound, so each image is processed in
+    a separate worker process. Must be called inside an app context. Returns
+    (images, files_written, source_bytes, derived_bytes).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    root = current_app.config['UPLOAD_FOLDER']
+    folders = folders or [name for name in sorted(os.listdir(root)) if os.path.isdir(os.path.join(root, name))]
+    paths = [os.path.join(root, folder, name)
+             for folder in folders if os.path.isdir(os.path.join(root, folder))
+             for name in sorted(os.listdir(os.path.join(root, folder)))
+             if name.lower().endswith(SOURCE_EXTENSIONS)]
+
+    widths, webp_quality, jpeg_quality = _config_args()
+    work = partial(make_derivatives, widths=widths, webp_quality=webp_quality, jpeg_quality=jpeg_quality,
+                   force=force)
+    images = written = source_bytes = derived_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, future in [(path, pool.submit(work, path)) for path in paths]:
+            try:
+                size, derived, files = future.result()
+            except Exception as e:
+                echo(f"Skipped {os.path.relpath(path, root)}: {e}")
+                continue
+            images += 1
+            written += files
+            source_bytes += size
+            derived_bytes += derived
+
+    versions.bump(IMAGES_VERSION)
+    return images, written, source_bytes, derived_bytes
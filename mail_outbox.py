@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from mail_transport import transport
+from models.models import EmailOutbox
+
+# Сколько секунд запись принадлежит доставщику, забравшему её; после падения процесса она снова станет доступна
+CLAIM_LEASE = 300
+
+# Верхняя граница паузы между повторными попытками
+RETRY_MAX = 6 * 3600
+
+
+def enqueue(message):
+    """Add a rendered flask_mail Message to the outbox in the current transaction"""
+    db.session.add(EmailOutbox(
+        subject=message.subject,
+        sender=message.sender if isinstance(message.sender, str) else None,
+        recipients=json.dumps(list(message.recipients), ensure_ascii=False),
+        html=message.html,
+        body=message.body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    ))
+    db.session.info['outbox_enqueued'] = True
+
+
+def _to_message(row):
+    message = Message(subject=row.subject, recipients=json.loads(row.recipients), html=row.html, body=row.body)
+    if row.sender:
+        message.sender = row.sender
+    return message
+
+
+def _claim(limit):
+    """Lease up to limit due emails to this run; portable alternative to SELECT ... SKIP LOCKED"""
+    now = datetime.utcnow()
+    token = str(uuid.uuid4())
+    due = [row.id for row in db.session.query(EmailOutbox.id).filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at).limit(limit)]
+    if not due:
+        return []
+
+    # Rows another run claimed in between no longer match next_attempt_at <= now
+    db.session.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(due),
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).update({EmailOutbox.claimed_by: token,
+              EmailOutbox.next_attempt_at: now + timedelta(seconds=CLAIM_LEASE),
+              EmailOutbox.attempts: EmailOutbox.attempts + 1}, synchronize_session=False)
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claimed_by=token, status='pending').order_by(EmailOutbox.id).all()
+
+
+def deliver_pending(limit=None):
+    """
+    Deliver due emails from the outbox over the worker's pooled SMTP connection.
+
+    Failed emails are retried with exponential backoff starting at
+    MAIL_OUTBOX_RETRY_BASE seconds; after MAIL_OUTBOX_MAX_ATTEMPTS attempts
+    they are marked dead and kept for inspection. Must be called inside an
+    app context. Returns (sent, failed).
+    """
+    config = current_app.config
+    rows = _claim(limit or config['MAIL_OUTBOX_BATCH'])
+    sent = failed = 0
+
+    for row in rows:
+        try:
+            transport.send([_to_message(row)])
+        except Exception as e:
+            failed += 1
+            row.last_error = f"{type(e).__name__}: {e}"
+            if row.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+                row.status = 'dead'
+                current_app.logger.error(f"Email {row.id} moved to dead letters after {row.attempts} attempts: {e}")
+            else:
+                delay = min(config['MAIL_OUTBOX_RETRY_BASE'] * 2 ** (row.attempts - 1), RETRY_MAX)
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                current_app.logger.warning(f"Email {row.id} failed, retry in {delay}s: {e}")
+        else:
+            sent += 1
+            row.status = 'sent'
+            row.sent_at = datetime.utcnow()
+            row.last_error = None
+        row.claimed_by = None
+        # Each result is saved at once, so a crash never re-sends a delivered email
+        db.session.commit()
+
+    return sent, failed
+
+
+class OutboxWorker:
+    """
+    Background thread that delivers the outbox in this worker process.
+
+    It wakes up right after a commit that queued emails and every
+    MAIL_OUTBOX_POLL_INTERVAL seconds to pick up retries and emails left by
+    other processes.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self, app):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._event = threading.Event()
+            threading.Thread(target=self._run, args=(app,), daemon=True, name='mail-outbox').start()
+
+    def wake(self):
+        self._event.set()
+
+    def _run(self, app):
+        while True:
+            self._event.wait(app.config['MAIL_OUTBOX_POLL_INTERVAL'])
+            self._event.clear()
+            with app.app_context():
+                try:
+                    # Keep going while full batches come back
+                    while True:
+                        sent, failed = deliver_pending()
+                        if sent + failed < app.config['MAIL_OUTBOX_BATCH']:
+                            break
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Error delivering email outbox: {e}")
+                finally:
+                    db.session.remove()
+
+
+worker = OutboxWorker()
+
+
+def init_outbox(app):
+    """Start the delivery thread of a serving worker with its first request"""
+    if not app.config.get('MAIL_OUTBOX_WORKER'):
+        return
+
+    @app.before_request
+    def start_outbox_worker():
+        worker.ensure_started(app)
+
+
+def _wake_after_commit(session):
+    if session.info.pop('outbox_enqueued', False):
+        worker.wake()
+
+
+def _forget_enqueued(session, *args):
+    session.info.pop('outbox_enqueued', None)
+
+
+event.listen(Session, 'after_commit', _wake_after_commit)
+event.listen(Session, 'after_rollback', _forget_enqueued)
@@ -0,0 +1,107 @@
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+from flask import current_app
+
+from app import mail
+
+# Ошибки соединения, после которых стоит переподключиться и дослать оставшиеся письма
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, ssl.SSLError)
+
+
+class MailTransport:
+    """
+    One warm SMTP connection per worker process, shared by all requests.
+
+    The connection is opened on first use through mail.connect(), pinged with
+    NOOP before reuse if it has been idle for MAIL_POOL_PING_AFTER seconds and
+    closed after MAIL_POOL_IDLE_TIMEOUT seconds of inactivity, before the
+    server drops it. A batch that fails because the connection died is resumed
+    on a fresh connection from the first unsent message.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._pid = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.reconnects = 0
+        self.sent = 0
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is None or connection.host is None:
+            return
+        try:
+            connection.host.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.host.close()
+
+    def _healthy(self, config):
+        idle = time.monotonic() - self._last_used
+        if idle > config['MAIL_POOL_IDLE_TIMEOUT']:
+            return False
+        if idle > config['MAIL_POOL_PING_AFTER'] and self._connection.host is not None:
+            try:
+                return self._connection.host.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def _get_connection(self, config):
+        # A connection inherited through fork belongs to the parent process
+        if self._connection is not None and self._pid == os.getpid() and self._healthy(config):
+            return self._connection
+
+        if self._pid == os.getpid():
+            self._close()
+        else:
+            self._connection = None
+        connection = mail.connect()
+        connection.__enter__()
+        self._connection, self._pid = connection, os.getpid()
+        self.connects += 1
+        return connection
+
+    def send(self, messages):
+        """Send messages over one SMTP session, reusing the worker's connection when enabled"""
+        config = current_app.config
+        if not config.get('MAIL_POOL_ENABLED'):
+            with mail.connect() as connection:
+                for message in messages:
+                    connection.send(message)
+            self.sent += len(messages)
+            return
+
+        with self._lock:
+            sent = 0
+            for attempt in range(2):
+                connection = self._get_connection(config)
+                try:
+                    for message in messages[sent:]:
+                        connection.send(message)
+                        sent += 1
+                    break
+                except RECONNECT_ERRORS:
+                    self._close()
+                    if attempt:
+                        raise
+                    self.reconnects += 1
+                finally:
+                    self._last_used = time.monotonic()
+            self.sent += sent
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def stats(self):
+        return {'connects': self.connects, 'reconnects': self.reconnects, 'sent': self.sent,
+                'open': self._connection is not None}
+
+
+transport = MailTransport()
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+
+import psutil
+from flask import current_app
+
+# Поля процесса, которые psutil читает за один проход (oneshot) при обходе списка
+ATTRS = ('pid', 'ppid', 'name', 'memory_percent', 'num_threads', 'cpu_times')
+
+# Ключи сортировки списка процессов; числовые сортируются по убыванию
+SORT_KEYS = {
+    'memory': lambda p: p['memory_percent'],
+    'cpu': lambda p: p['cpu_times'][0] + p['cpu_times'][1],
+    'threads': lambda p: p['num_threads'],
+    'pid': lambda p: p['pid'],
+    'name': lambda p: p['name'].lower(),
+}
+_ASCENDING = ('pid', 'name')
+
+SCOPES = ('all', 'app')
+
+_snapshot = {'taken': 0.0, 'processes': []}
+_lock = threading.Lock()
+
+
+def _scan():
+    """Every process of the host as a list of dicts; processes that exit or deny access are skipped"""
+    processes = []
+    for proc in psutil.process_iter(attrs=ATTRS, ad_value=None):
+        info = proc.info
+        if info['name'] is None or info['memory_percent'] is None or info['cpu_times'] is None:
+            continue
+        info['cpu_times'] = [info['cpu_times'].user, info['cpu_times'].system]
+        info['num_threads'] = info['num_threads'] or 0
+        processes.append(info)
+    return processes
+
+
+def snapshot():
+    """
+    The host's process list, rescanned at most every PROCESS_SNAPSHOT_TTL seconds.
+
+    Requests that arrive while a scan is running wait for it and share its
+    result instead of scanning again. The list is per worker process.
+    """
+    ttl = current_app.config['PROCESS_SNAPSHOT_TTL']
+    if time.monotonic() - _snapshot['taken'] < ttl:
+        return _snapshot['processes']
+    with _lock:
+        if time.monotonic() - _snapshot['taken'] >= ttl:
+            _snapshot['processes'] = _scan()
+            _snapshot['taken'] = time.monotonic()
+    return _snapshot['processes']
+
+
+def app_tree(processes):
+    """
+    pids of the application's process tree: the gunicorn master and all of
+    its descendants, or this process and its children outside gunicorn.
+    """
+    by_pid = {p['pid']: p for p in processes}
+    root = os.getpid()
+    parent = by_pid.get(root, {}).get('ppid')
+    while parent in by_pid and 'gunicorn' in by_pid[parent]['name']:
+        root, parent = parent, by_pid[parent]['ppid']
+
+    children = {}
+    for p in processes:
+        children.setdefault(p['ppid'], []).append(p['pid'])
+    tree, stack = set(), [root]
+    while stack:
+        pid = stack.pop()
+        if pid not in tree:
+            tree.add(pid)
+            stack.extend(children.get(pid, ()))
+    return tree
+
+
+def list_processes(scope='all', sort=None, limit=None):
+    """(processes, total): the snapshot scoped, sorted and cut to the top limit"""
+    processes = snapshot()
+    if scope == 'app':
+        tree = app_tree(processes)
+        processes = [p for p in processes if p['pid'] in tree]
+    total = len(processes)
+    if sort in SORT_KEYS:
+        processes = sorted(processes, key=SORT_KEYS[sort], reverse=sort not in _ASCENDING)
+    if limit:
+        processes = processes[:limit]
+    return processes, total
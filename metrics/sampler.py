@@ -0,0 +1,204 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+import psutil
+from flask import current_app
+
+from cache import versions
+
+# Поля одного замера: время, загрузка CPU, памяти и диска в процентах, скорости диска и сети в байтах в секунду
+FIELDS = ('t', 'cpu', 'mem', 'disk', 'disk_read', 'disk_write', 'net_sent', 'net_recv')
+
+_HEADER = struct.Struct('<QI')  # Samples written so far, capacity
+_RECORD = struct.Struct(f'<{len(FIELDS)}d')
+
+# Как часто процесс, не ставший сэмплером, проверяет, не освободилась ли блокировка
+CANDIDATE_RETRY = 10
+
+
+class RingBuffer:
+    """
+    Fixed-size ring buffer of samples in a file shared by all workers of the host.
+
+    The header holds the number of samples ever written; sample n lives in
+    slot n % capacity. The single writer fills the slot before it advances
+    the counter, so readers never see a sample that is still being written.
+    """
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self._map = None
+
+    def open_for_writing(self):
+        size = _HEADER.size + _RECORD.size * self.capacity
+        with open(self.path, 'a+b') as f:
+            f.seek(0, os.SEEK_END)
+            existing = f.tell()
+            if existing != size:
+                f.truncate(0)
+                f.truncate(size)
+        f = open(self.path, 'r+b')
+        self._map = mmap.mmap(f.fileno(), size)
+        f.close()
+        written, capacity = _HEADER.unpack_from(self._map, 0)
+        if capacity != self.capacity:
+            # Another capacity or a fresh file: start over
+            _HEADER.pack_into(self._map, 0, 0, self.capacity)
+
+    def append(self, values):
+        written, _ = _HEADER.unpack_from(self._map, 0)
+        _RECORD.pack_into(self._map, _HEADER.size + _RECORD.size * (written % self.capacity), *values)
+        _HEADER.pack_into(self._map, 0, written + 1, self.capacity)
+
+    def read(self, count):
+        """Up to count newest samples, oldest first, as dicts"""
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return []
+                written, capacity = _HEADER.unpack(header)
+                # The oldest slot is the next one to be overwritten
+                count = min(count, written, capacity - 1)
+                samples = []
+                for n in range(written - count, written):
+                    f.seek(_HEADER.size + _RECORD.size * (n % capacity))
+                    samples.append(dict(zip(FIELDS, _RECORD.unpack(f.read(_RECORD.size)))))
+                return samples
+        except (FileNotFoundError, struct.error):
+            return []
+
+
+class MetricsSampler:
+    """
+    One thread per host that samples system metrics into the shared ring buffer.
+
+    Every worker starts a candidate thread; the one that gets the exclusive
+    lock on CACHE_DIR/metrics.lock samples every METRICS_INTERVAL seconds,
+    the others check every CANDIDATE_RETRY intervals whether the lock has
+    been released by a worker that exited. Rates are computed from the
+    counters of consecutive samples, so they do not depend on which worker
+    serves a request.
+    """
+
+    def __init__(self):
+        self._pid = None
+        self._lock = threading.Lock()
+        self.sampling = False
+
+    def ensure_started(self, app):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.sampling = False
+            threading.Thread(target=self._run, args=(app,), daemon=True, name='metrics-sampler').start()
+
+    def _try_lock(self, path):
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows development server): a single process is assumed
+            return open(path, 'a')
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _run(self, app):
+        interval = app.config['METRICS_INTERVAL']
+        with app.app_context():
+            directory = versions.cache_dir()
+        buffer = buffer_for(app.config)
+        while True:
+            lock_file = self._try_lock(os.path.join(directory, 'metrics.lock'))
+            if lock_file is None:
+                time.sleep(interval * CANDIDATE_RETRY)
+                continue
+            # The lock is held for the life of the process
+            self.sampling = True
+            try:
+                self._sample_forever(buffer, interval)
+            except Exception as e:
+                app.logger.error(f"Metrics sampler stopped: {e}")
+                self.sampling = False
+                lock_file.close()
+                time.sleep(interval * CANDIDATE_RETRY)
+
+    @staticmethod
+    def _sample_forever(buffer, interval):
+        buffer.open_for_writing()
+        psutil.cpu_percent(interval=None)  # The first call only starts the measurement
+        previous, previous_time = _counters(), time.monotonic()
+        next_tick = previous_time + interval
+
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            next_tick += interval
+
+            now = time.monotonic()
+            counters = _counters()
+            elapsed = now - previous_time
+            rates = [(current - before) / elapsed if current >= before else 0.0
+                     for current, before in zip(counters, previous)]
+            previous, previous_time = counters, now
+
+            buffer.append((time.time(), psutil.cpu_percent(interval=None), psutil.virtual_memory().percent,
+                           psutil.disk_usage('/').percent, *rates))
+
+
+def _counters():
+    """(disk_read, disk_write, net_sent, net_recv) byte counters; zeros where the platform has none"""
+    disk = psutil.disk_io_counters()
+    net = psutil.net_io_counters()
+    return (disk.read_bytes if disk else 0, disk.write_bytes if disk else 0,
+            net.bytes_sent if net else 0, net.bytes_recv if net else 0)
+
+
+def buffer_for(config):
+    return RingBuffer(os.path.join(config['CACHE_DIR'], 'metrics.ring'), config['METRICS_HISTORY'])
+
+
+sampler = MetricsSampler()
+
+
+def latest():
+    """
+    The newest sample, or a one-off instant reading when the sampler has not
+    written one recently (disabled, or just starting).
+    """
+    config = current_app.config
+    samples = buffer_for(config).read(1)
+    if samples and time.time() - samples[0]['t'] <= config['METRICS_INTERVAL'] * 3:
+        return dict(samples[0], stale=False)
+    # Non-blocking: the CPU load since the previous call in this process, no rates
+    return {'t': time.time(), 'cpu': psutil.cpu_percent(interval=None), 'mem': psutil.virtual_memory().percent,
+            'disk': psutil.disk_usage('/').percent, 'disk_read': 0.0, 'disk_write': 0.0,
+            'net_sent': 0.0, 'net_recv': 0.0, 'stale': True}
+
+
+def history(seconds):
+    """Samples of the last seconds seconds, oldest first"""
+    config = current_app.config
+    since = time.time() - seconds
+    samples = buffer_for(config).read(int(seconds / config['METRICS_INTERVAL']) + 1)
+    return [sample for sample in samples if sample['t'] >= since]
+
+
+def init_metrics(app):
+    """Start the sampler candidate thread of a serving worker with its first request"""
+    if not app.config.get('METRICS_SAMPLER_ENABLED'):
+        return
+
+    @app.before_request
+    def start_metrics_sampler():
+        sampler.ensure_started(app)
@@ -13,9 +13,14 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# flask db looks for migrations/alembic.ini, which is not shipped: then logging is left as is
+if config.config_file_name is not None and os.path.exists(config.config_file_name):
     fileConfig(config.config_file_name)
 
+# alembic.ini only names the variable; the URL itself comes from the environment, as for the app
+if config.get_main_option('sqlalchemy.url') in (None, 'DATABASE_URL'):
+    config.set_main_option('sqlalchemy.url', os.environ['DATABASE_URL'].replace('%', '%%'))
+
 # Add your model's MetaData object here for 'autogenerate' support
 # Example: if you are using Flask-SQLAlchemy
 # from your_app.models import db
@@ -0,0 +1,43 @@
+"""Add persisted SEO keywords to lectures and sections
+
+Revision ID: 3f1a9c2d7b10
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c2d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table):
+    """Column names of an existing table, or None if the table does not exist yet"""
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return None
+    return {c['name'] for c in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tables created by db.create_all() already have the column
+    for table in ('lectures', 'sections'):
+        columns = _columns(table)
+        if columns is not None and 'seo_keywords' not in columns:
+            op.add_column(table, sa.Column('seo_keywords', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('lectures', 'sections'):
+        columns = _columns(table)
+        if columns is not None and 'seo_keywords' in columns:
+            op.drop_column(table, 'seo_keywords')
@@ -0,0 +1,74 @@
+"""Store slugs in lowercase and index lower(slug)
+
+Revision ID: 8c4e2b7a9d51
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4e2b7a9d51'
+down_revision: Union[str, None] = '3f1a9c2d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('sections', 'lectures')
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def _has_table(table):
+    return table in sa.inspect(op.get_bind()).get_table_names()
+
+
+def _lowercase_slugs(table):
+    """
+    Lowercase the slugs of table row by row.
+
+    A row whose lowercase slug is already taken (by a lowercase row or an
+    earlier mixed-case one) gets -<id> appended, otherwise the 301 from its
+    old URL would lead to the other row. Renamed rows are logged, since their
+    old links now land on the other page.
+    """
+    bind = op.get_bind()
+    taken = {slug for slug, in bind.execute(sa.text(f"SELECT slug FROM {table} WHERE slug = lower(slug)"))}
+    rows = bind.execute(sa.text(f"SELECT id, slug FROM {table} WHERE slug <> lower(slug) ORDER BY id")).all()
+
+    for row_id, slug in rows:
+        new_slug = slug.lower()
+        if new_slug in taken:
+            new_slug = f"{new_slug}-{row_id}"
+            suffix = 2
+            while new_slug in taken:
+                new_slug = f"{slug.lower()}-{row_id}-{suffix}"
+                suffix += 1
+            logger.warning(f"{table} {row_id}: slug {slug!r} collides with another row in lowercase, "
+                           f"renamed to {new_slug!r}")
+        taken.add(new_slug)
+        bind.execute(sa.text(f"UPDATE {table} SET slug = :slug WHERE id = :id"), {'slug': new_slug, 'id': row_id})
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        if not _has_table(table):
+            continue
+
+        _lowercase_slugs(table)
+
+        # Tables created by db.create_all() already have the index; expression
+        # indexes are not reflected on every backend, so let the database check
+        op.create_index(f'ix_{table}_slug_lower', table, [sa.text('lower(slug)')], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        if _has_table(table):
+            op.drop_index(f'ix_{table}_slug_lower', table_name=table, if_exists=True)
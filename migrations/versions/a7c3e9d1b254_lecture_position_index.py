@@ -0,0 +1,39 @@
+"""Index lectures by coalesce(order, 0), the expression pages sort and paginate on
+
+Revision ID: a7c3e9d1b254
+Revises: f2b8d6c4a913
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d1b254'
+down_revision: Union[str, None] = 'f2b8d6c4a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_ONLY = {'postgresql_where': sa.text('is_active'), 'sqlite_where': sa.text('is_active = 1')}
+
+INDEX = 'ix_lectures_section_active_order'
+
+
+def _replace_index(columns):
+    if 'lectures' not in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.drop_index(INDEX, table_name='lectures', if_exists=True)
+    op.create_index(INDEX, 'lectures', columns, **ACTIVE_ONLY)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_index(['section_id', sa.text('coalesce("order", 0)'), 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_index(['section_id', 'order', 'id'])
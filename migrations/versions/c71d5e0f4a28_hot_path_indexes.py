@@ -0,0 +1,51 @@
+"""Composite and partial indexes for catalog and order queries
+
+Revision ID: c71d5e0f4a28
+Revises: 8c4e2b7a9d51
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d5e0f4a28'
+down_revision: Union[str, None] = '8c4e2b7a9d51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_ONLY = {'postgresql_where': sa.text('is_active'), 'sqlite_where': sa.text('is_active = 1')}
+
+# (name, table, columns, partial over active rows)
+INDEXES = (
+    ('ix_lectures_section_active_order', 'lectures', ['section_id', 'order', 'id'], True),
+    ('ix_sections_active_order', 'sections', ['order', 'id'], True),
+    ('ix_home_blocks_active_order', 'home_blocks', ['order'], True),
+    ('ix_menu_items_active_parent_order', 'menu_items', ['parent_id', 'order'], True),
+    ('ix_order_forms_user_created', 'order_forms', ['user_id', 'created_at'], False),
+    ('ix_order_forms_lecturer_created', 'order_forms', ['lecturer_id', 'created_at'], False),
+)
+
+
+def _tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _tables()
+    for name, table, columns, active_only in INDEXES:
+        # Tables created by db.create_all() already have the indexes
+        if table in tables:
+            op.create_index(name, table, columns, if_not_exists=True, **(ACTIVE_ONLY if active_only else {}))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _tables()
+    for name, table, columns, active_only in INDEXES:
+        if table in tables:
+            op.drop_index(name, table_name=table, if_exists=True)
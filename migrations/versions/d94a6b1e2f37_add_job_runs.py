@@ -0,0 +1,49 @@
+"""Add job_runs history of scheduled jobs
+
+Revision ID: d94a6b1e2f37
+Revises: c71d5e0f4a28
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd94a6b1e2f37'
+down_revision: Union[str, None] = 'c71d5e0f4a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table):
+    return table in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases initialized by `flask init-db` already have the table
+    if _has_table('job_runs'):
+        return
+    op.create_table(
+        'job_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('host', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_runs_job_id', 'job_runs', ['job_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _has_table('job_runs'):
+        op.drop_index('ix_job_runs_job_id', table_name='job_runs')
+        op.drop_table('job_runs')
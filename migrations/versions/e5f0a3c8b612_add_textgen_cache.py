@@ -0,0 +1,50 @@
+"""Add textgen_cache of generated texts
+
+Revision ID: e5f0a3c8b612
+Revises: d94a6b1e2f37
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f0a3c8b612'
+down_revision: Union[str, None] = 'd94a6b1e2f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table):
+    return table in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases initialized by `flask init-db` already have the table
+    if _has_table('textgen_cache'):
+        return
+    op.create_table(
+        'textgen_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('task_type', sa.String(length=50), nullable=True),
+        sa.Column('model', sa.String(length=100), nullable=True),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index('ix_textgen_cache_created_at', 'textgen_cache', ['created_at'])
+    op.create_index('ix_textgen_cache_last_used_at', 'textgen_cache', ['last_used_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _has_table('textgen_cache'):
+        op.drop_index('ix_textgen_cache_last_used_at', table_name='textgen_cache')
+        op.drop_index('ix_textgen_cache_created_at', table_name='textgen_cache')
+        op.drop_table('textgen_cache')
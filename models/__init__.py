@@ -1,4 +1,6 @@
 # This file makes the models directory a Python package
-from .models import User, Role, Section, LectureType, Lecture, Contact, OrderForm, MenuItem, HomeBlock
+from .models import (User, Role, Section, LectureType, Lecture, Contact, OrderForm, MenuItem, HomeBlock, JobRun,
+                     TextgenCache, EmailOutbox)
 
-__all__ = ['User', 'Role', 'Section', 'LectureType', 'Lecture', 'Contact', 'OrderForm', 'MenuItem', 'HomeBlock']
+__all__ = ['User', 'Role', 'Section', 'LectureType', 'Lecture', 'Contact', 'OrderForm', 'MenuItem', 'HomeBlock', 'JobRun',
+           'TextgenCache', 'EmailOutbox']
@@ -1,6 +1,15 @@
 from datetime import datetime
+from sqlalchemy import event, func
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from nlp.keywords import refresh_keywords_listener
+
+def active_index(name, *columns):
+    """Partial index over active rows only, the only ones public pages read"""
+    return db.Index(name, *columns,
+                    postgresql_where=db.text('is_active'),
+                    sqlite_where=db.text('is_active = 1'))
 
 # Define the association table for user roles
 user_roles = db.Table('user_roles',
@@ -84,12 +93,25 @@ class Section(db.Model):
     image = db.Column(db.String(255))
     order = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
+    seo_keywords = db.Column(db.Text, nullable=True)  # Keywords extracted from name, refreshed when it changes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship with lectures
     lectures = db.relationship('Lecture', backref='section', lazy='dynamic')
 
+    __table_args__ = (
+        # Serves the case-insensitive lookup by slug
+        db.Index('ix_sections_slug_lower', func.lower(slug)),
+        # Active sections in display order
+        active_index('ix_sections_active_order', order, id),
+    )
+
+    @validates('slug')
+    def normalize_slug(self, key, value):
+        """Slugs are stored in lowercase"""
+        return value.strip().lower() if value else value
+
     def __repr__(self):
         return f'<Section {self.name}>'
 
@@ -120,6 +142,7 @@ class Lecture(db.Model):
     slug = db.Column(db.String(255), unique=True, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     order = db.Column(db.Integer, default=0)
+    seo_keywords = db.Column(db.Text, nullable=True)  # Keywords extracted from title, refreshed when it changes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -128,9 +151,24 @@ class Lecture(db.Model):
     section_id = db.Column(db.Integer, db.ForeignKey('sections.id'))
     lecture_type_id = db.Column(db.Integer, db.ForeignKey('lecture_types.id'))
 
+    __table_args__ = (
+        # Serves the case-insensitive lookup by slug
+        db.Index('ix_lectures_slug_lower', func.lower(slug)),
+        # Active lectures of a section in display order (section pages, pagination, related cards)
+        active_index('ix_lectures_section_active_order', section_id, func.coalesce(order, 0), id),
+    )
+
+    @validates('slug')
+    def normalize_slug(self, key, value):
+        """Slugs are stored in lowercase"""
+        return value.strip().lower() if value else value
+
     def __repr__(self):
         return f'<Lecture {self.title}>'
 
+# Display position of a lecture: a cleared order counts as 0 in ORDER BY, keyset cursors and the index alike
+LECTURE_POSITION = func.coalesce(Lecture.order, 0)
+
 class Contact(db.Model):
     """Model for contact information"""
     __tablename__ = 'contacts'
@@ -179,6 +217,12 @@ class OrderForm(db.Model):
     # Relationship with lecturer (different from the user who placed the order)
     lecturer = db.relationship('User', foreign_keys=[lecturer_id], backref='assigned_orders')
 
+    __table_args__ = (
+        # Order history of a user and orders assigned to a lecturer, newest first
+        db.Index('ix_order_forms_user_created', user_id, created_at),
+        db.Index('ix_order_forms_lecturer_created', lecturer_id, created_at),
+    )
+
     def __repr__(self):
         return f'<OrderForm {self.name} - {self.status}>'
 
@@ -196,6 +240,9 @@ class MenuItem(db.Model):
     # Self-referential relationship for hierarchical menu
     children = db.relationship('MenuItem', backref=db.backref('parent', remote_side=[id]))
 
+    # Active children of a menu item in display order
+    __table_args__ = (active_index('ix_menu_items_active_parent_order', parent_id, order),)
+
     def __repr__(self):
         return f'<MenuItem {self.name}>'
 
@@ -215,6 +262,9 @@ class HomeBlock(db.Model):
     slug = db.Column(db.String(255), unique=False, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
 
+    # Active homepage blocks in display order
+    __table_args__ = (active_index('ix_home_blocks_active_order', order),)
+
     def __repr__(self):
         return f'<HomeBlock {self.title}>'
 
@@ -235,3 +285,63 @@ class SeoSettings(db.Model):
 
     def __repr__(self):
         return f'<SeoSettings {self.id}>'
+
+class JobRun(db.Model):
+    """History of scheduled background job runs"""
+    __tablename__ = 'job_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), nullable=False, index=True)  # APScheduler job id
+    status = db.Column(db.String(20), default='running')  # running, success, failed
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration = db.Column(db.Float, nullable=True)  # Seconds
+    error = db.Column(db.Text, nullable=True)
+    host = db.Column(db.String(255))  # hostname:pid of the leader that ran the job
+
+    def __repr__(self):
+        return f'<JobRun {self.job_id} - {self.status}>'
+
+class TextgenCache(db.Model):
+    """Cached OpenAI completions keyed by a hash of the prompt and generation parameters"""
+    __tablename__ = 'textgen_cache'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of template, text, model and temperature
+    task_type = db.Column(db.String(50))
+    model = db.Column(db.String(100))
+    result = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # TTL is counted from here
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Size eviction drops the oldest
+
+    def __repr__(self):
+        return f'<TextgenCache {self.key[:12]} {self.task_type}>'
+
+class EmailOutbox(db.Model):
+    """Rendered emails waiting for delivery, written in the same transaction as the data they describe"""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255))
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    html = db.Column(db.Text)
+    body = db.Column(db.Text)
+    status = db.Column(db.String(20), default='pending')  # pending, sent, dead
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)  # Also the lease of a claimed row
+    claimed_by = db.Column(db.String(36))  # Token of the delivery run that owns the row
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    # Due pending emails, oldest first
+    __table_args__ = (db.Index('ix_email_outbox_status_next_attempt', status, next_attempt_at),)
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.subject} - {self.status}>'
+
+# Keep persisted SEO keywords in sync with the text they are extracted from
+for _model, _source_attr in ((Lecture, 'title'), (Section, 'name')):
+    event.listen(_model, 'before_insert', refresh_keywords_listener(_source_attr))
+    event.listen(_model, 'before_update', refresh_keywords_listener(_source_attr))
@@ -0,0 +1,6 @@
+# This file makes the nlp directory a Python package
+from .registry import registry
+from .language import detect_language
+from .keywords import extract_keywords, cached_keywords, keywords_for
+
+__all__ = ['registry', 'detect_language', 'extract_keywords', 'cached_keywords', 'keywords_for']
@@ -0,0 +1,109 @@
+import time
+from collections import defaultdict
+
+from sqlalchemy import bindparam, update
+
+from app import db
+from cache import versions
+from cache.pages import CONTENT_VERSION
+from cache.related import RELATED_VERSION
+from models.models import Lecture, Section
+from .keywords import KEYWORDS_VERSION, keywords_from_doc
+from .language import detect_language
+from .registry import registry
+
+# Модели и поля, из которых извлекаются ключевые слова
+KEYWORD_SOURCES = ((Lecture, 'title'), (Section, 'name'))
+
+
+def iter_chunks(model, source_attr, chunk_size, only_missing=False):
+    """
+    Yield (id, text) rows of active records in id order, chunk_size at a time.
+
+    Keyset pagination on id keeps every chunk query cheap regardless of how
+    far into the table we are, and only two columns are ever loaded.
+    """
+    column = getattr(model, source_attr)
+    last_id = 0
+
+    while True:
+        query = db.session.query(model.id, column).filter(model.is_active == True, model.id > last_id)
+        if only_missing:
+            query = query.filter(model.seo_keywords.is_(None))
+
+        rows = query.order_by(model.id).limit(chunk_size).all()
+        if not rows:
+            return
+
+        yield rows
+        last_id = rows[-1][0]
+
+
+def backfill_keywords(batch_size=256, n_process=1, chunk_size=1000, only_missing=False, echo=print):
+    """
+    Recompute seo_keywords for all active lectures and sections.
+
+    Each chunk is grouped by detected language and fed through nlp.pipe, then
+    written back with a single executemany UPDATE and committed. The Core
+    UPDATE bypasses the ORM hooks that bump cache versions, so the cached
+    pages, related cards and page validators are invalidated explicitly.
+
+    Args:
+        batch_size (int): Documents per nlp.pipe batch
+        n_process (int): Worker processes for nlp.pipe
+        chunk_size (int): Rows read and committed per database round trip
+        only_missing (bool): Skip rows that already have keywords
+        echo (callable): Progress reporter
+
+    Returns:
+        dict: Number of processed documents and elapsed seconds
+    """
+    total_docs = 0
+    started = time.perf_counter()
+
+    for model, source_attr in KEYWORD_SOURCES:
+        table = model.__table__
+        # Keep updated_at as is: keywords are derived data, not a content change
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam('_id'))
+            .values(seo_keywords=bindparam('_keywords'), updated_at=table.c.updated_at)
+        )
+
+        model_docs = 0
+        model_started = time.perf_counter()
+
+        for rows in iter_chunks(model, source_attr, chunk_size, only_missing):
+            by_lang = defaultdict(list)
+            for row_id, text in rows:
+                by_lang[detect_language(text or '')].append((row_id, text or ''))
+
+            params = []
+            for lang, items in by_lang.items():
+                nlp = registry.get(lang)
+                if nlp is None:
+                    echo(f"Skipping {len(items)} {table.name} rows: no spaCy model for '{lang}'")
+                    continue
+
+                docs = nlp.pipe((text for _, text in items), batch_size=batch_size, n_process=n_process)
+                params.extend(
+                    {'_id': row_id, '_keywords': keywords_from_doc(doc)}
+                    for (row_id, _), doc in zip(items, docs)
+                )
+
+            if params:
+                db.session.execute(stmt, params)
+                db.session.commit()
+                for name in (CONTENT_VERSION, RELATED_VERSION, KEYWORDS_VERSION):
+                    versions.bump(name)
+
+            model_docs += len(params)
+            elapsed = time.perf_counter() - model_started
+            echo(f"{table.name}: {model_docs} documents, {model_docs / elapsed if elapsed else 0:.1f} docs/sec")
+
+        total_docs += model_docs
+
+    elapsed = time.perf_counter() - started
+    echo(f"Done: {total_docs} documents in {elapsed:.1f}s ({total_docs / elapsed if elapsed else 0:.1f} docs/sec)")
+
+    return {'documents': total_docs, 'seconds': elapsed}
@@ -0,0 +1,99 @@
+from functools import lru_cache
+
+from flask import current_app
+
+from .language import detect_language
+from .registry import registry
+
+# Части речи, которые нужно исключить
+EXCLUDED_POS = {
+    'ADP',  # предлоги
+    'CCONJ',  # сочинительные союзы
+    'SCONJ',  # подчинительные союзы
+    'PRON',  # местоимения
+    'PART',  # частицы (типа бы, же, ли)
+    'DET',  # определители (this, that, etc.)
+    'INTJ'  # междометия
+}
+
+# Имя версии, которая сбрасывается после пакетного пересчёта ключевых слов (updated_at при нём не меняется)
+KEYWORDS_VERSION = 'keywords'
+
+# Максимальное число строк, для которых ключевые слова хранятся в памяти процесса
+KEYWORDS_CACHE_SIZE = 1024
+
+
+def keywords_from_doc(doc):
+    """Join the significant words of a parsed spaCy document with commas"""
+    words = [token.text for token in doc if token.pos_ not in EXCLUDED_POS and token.is_alpha]
+    return ', '.join(words)
+
+
+def extract_keywords(text):
+    """
+    Run language detection and the spaCy pipeline on text.
+
+    This is the expensive path: it is meant to be called when a title is saved,
+    not while rendering a page.
+
+    Args:
+        text (str): Lecture title, section name or any other short text
+
+    Returns:
+        str: Comma-separated keywords, or None if NLP is disabled or unavailable
+    """
+    if not text:
+        return ''
+
+    # Модель загружается при первом обращении
+    nlp = registry.get(detect_language(text))
+    if nlp is None:
+        return None
+    return keywords_from_doc(nlp(text))
+
+
+@lru_cache(maxsize=KEYWORDS_CACHE_SIZE)
+def cached_keywords(text):
+    """In-process LRU wrapper around extract_keywords for ad-hoc strings"""
+    return extract_keywords(text)
+
+
+def keywords_for(value):
+    """
+    Return keywords for a Lecture, a Section or a plain string.
+
+    Models are answered from their persisted seo_keywords column only; rows
+    that have not been processed yet render without keywords until the mapper
+    listener or `flask extract-keywords` fills the column, so page rendering
+    never runs spaCy. Plain strings go through the LRU cache.
+    """
+    if not value:
+        return ''
+
+    if isinstance(value, str):
+        return cached_keywords(value) or ''
+
+    return getattr(value, 'seo_keywords', None) or ''
+
+
+def refresh_keywords_listener(source_attr):
+    """
+    Build a before_insert/before_update mapper listener that recomputes
+    target.seo_keywords whenever source_attr (title or name) changes.
+    """
+    def listener(mapper, connection, target):
+        from sqlalchemy import inspect
+
+        history = inspect(target).attrs[source_attr].history
+        if target.seo_keywords and not history.has_changes():
+            return
+
+        try:
+            keywords = extract_keywords(getattr(target, source_attr))
+            if keywords is not None:
+                target.seo_keywords = keywords
+        except Exception as e:
+            # Keywords are not critical: never block saving the row because of NLP
+            current_app.logger.error(f"Error extracting keywords for {target!r}: {e}")
+
+    return listener
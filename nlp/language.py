@@ -0,0 +1,119 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from langdetect import DetectorFactory, detect
+
+# langdetect is randomised unless seeded: the same title could flip between models
+DetectorFactory.seed = 0
+
+# Доля букв одного алфавита, начиная с которой langdetect не вызывается
+SCRIPT_RATIO_THRESHOLD = 0.7
+
+# Максимальное число запомненных результатов определения языка
+LANGUAGE_CACHE_SIZE = 4096
+
+DEFAULT_LANGUAGE = 'ru'
+
+
+class _LanguageCache:
+    """Bounded LRU mapping of text digests to detected languages"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            lang = self._data.get(key)
+            if lang is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return lang
+
+    def set(self, key, lang):
+        with self._lock:
+            self._data[key] = lang
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = _LanguageCache(LANGUAGE_CACHE_SIZE)
+
+
+def script_language(text):
+    """
+    Guess the language from the share of Cyrillic vs Latin letters.
+
+    Returns 'ru' or 'en' when one script clearly dominates, None otherwise.
+    """
+    cyrillic = latin = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        if 'Ѐ' <= char <= 'ӿ':
+            cyrillic += 1
+        elif char.isascii():
+            latin += 1
+
+    letters = cyrillic + latin
+    if not letters:
+        return None
+    if cyrillic / letters >= SCRIPT_RATIO_THRESHOLD:
+        return 'ru'
+    if latin / letters >= SCRIPT_RATIO_THRESHOLD:
+        return 'en'
+    return None
+
+
+def _detect_uncached(text):
+    lang = script_language(text)
+    if lang is not None:
+        return lang
+
+    # Mixed or non-Cyrillic/Latin text: let the (seeded) statistical detector decide
+    try:
+        return detect(text)
+    except:
+        return DEFAULT_LANGUAGE
+
+
+def detect_language(text):
+    """
+    Deterministically detect the language of text.
+
+    Character script ratios settle almost every title; langdetect is only
+    consulted for ambiguous text. Results are memoized by text digest.
+    """
+    if not text:
+        return DEFAULT_LANGUAGE
+
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    lang = _cache.get(key)
+    if lang is None:
+        lang = _detect_uncached(text)
+        _cache.set(key, lang)
+    return lang
+
+
+def cache_info():
+    """Hit/miss counters and size of the detection cache"""
+    return _cache.info()
+
+
+def clear_cache():
+    _cache.clear()
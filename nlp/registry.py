@@ -0,0 +1,98 @@
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+# Модели spaCy по умолчанию для поддерживаемых языков
+DEFAULT_MODELS = {
+    'ru': 'ru_core_news_sm',
+    'en': 'en_core_web_sm',
+}
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of spaCy pipelines.
+
+    A pipeline is loaded on the first request for its language, so workers
+    and CLI commands that never extract keywords never import spaCy at all.
+    Loading can be switched off with the NLP_ENABLED config flag.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._timings = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _config(key, default):
+        if has_app_context():
+            return current_app.config.get(key, default)
+        return default
+
+    def enabled(self):
+        return self._config('NLP_ENABLED', True)
+
+    def model_names(self):
+        return self._config('NLP_MODELS', DEFAULT_MODELS)
+
+    def get(self, lang):
+        """
+        Return the pipeline for lang, loading it on first use.
+
+        Unknown languages fall back to English, the same way the template
+        filter always did. Returns None if NLP is disabled or the model
+        cannot be loaded.
+        """
+        if not self.enabled():
+            return None
+
+        names = self.model_names()
+        if lang not in names:
+            lang = 'en'
+
+        nlp = self._models.get(lang)
+        if nlp is not None or lang in self._errors:
+            return nlp
+
+        with self._lock:
+            # Another thread may have loaded it while we were waiting
+            if lang in self._models or lang in self._errors:
+                return self._models.get(lang)
+
+            started = time.perf_counter()
+            try:
+                import spacy
+                nlp = spacy.load(names[lang])
+            except Exception as e:
+                self._errors[lang] = str(e)
+                if has_app_context():
+                    current_app.logger.error(f"Error loading spaCy model {names[lang]}: {e}")
+                return None
+
+            self._timings[lang] = time.perf_counter() - started
+            self._models[lang] = nlp
+            if has_app_context():
+                current_app.logger.info(f"Loaded spaCy model {names[lang]} in {self._timings[lang]:.2f}s")
+            return nlp
+
+    def stats(self):
+        """Loaded models, their load times in seconds and load errors"""
+        names = self.model_names()
+        return {
+            'enabled': self.enabled(),
+            'models': {
+                lang: {
+                    'name': name,
+                    'loaded': lang in self._models,
+                    'load_seconds': round(self._timings[lang], 3) if lang in self._timings else None,
+                    'error': self._errors.get(lang),
+                }
+                for lang, name in names.items()
+            }
+        }
+
+
+# Единый реестр моделей на процесс
+registry = ModelRegistry()
@@ -0,0 +1 @@
+# This file makes the seo directory a Python package
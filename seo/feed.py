@@ -0,0 +1,247 @@
+import glob
+import gzip
+import os
+import threading
+from datetime import datetime
+from xml.sax.saxutils import XMLGenerator
+
+from flask import current_app, url_for
+
+from app import db
+from cache import versions
+from models.models import Section, Lecture
+from utils import get_start_date
+
+# Имя версии, которая сбрасывается при изменении лекций или разделов
+FEED_VERSION = 'feed'
+
+versions.track(FEED_VERSION, Lecture, Section)
+
+# Сколько строк читать из серверного курсора за один раз
+FEED_CHUNK_SIZE = 500
+
+# Постоянные параметры предложений фида
+OFFER_PARAMS = (
+    ('Формат обучения', 'В группе с наставником'),
+    ('Есть вебинары', 'false'),
+    ('Есть домашние работы', 'false'),
+    ('Есть видеоуроки', 'false'),
+    ('Есть текстовые уроки', 'false'),
+    ('Есть тренажеры', 'false'),
+    ('Есть сообщество', 'false'),
+    ('Сложность', 'Для новичков'),
+    ('Тип обучения', 'Курс'),
+    ('План', 'Вводная часть, Основная часть, Практическая часть, Заключение'),
+)
+
+# Ключи фидов, которые сейчас собираются в этом процессе
+_building = set()
+_building_lock = threading.Lock()
+
+
+class _Tee:
+    """Binary sink that writes everything to a plain and a gzip file at once"""
+
+    def __init__(self, *files):
+        self.files = files
+
+    def write(self, data):
+        for f in self.files:
+            f.write(data)
+        return len(data)
+
+
+class _Writer:
+    """Thin indentation-aware wrapper around XMLGenerator"""
+
+    def __init__(self, out):
+        self.xml = XMLGenerator(out, encoding='utf-8', short_empty_elements=True)
+        self.depth = 0
+
+    def _indent(self):
+        self.xml.ignorableWhitespace('\n' + '  ' * self.depth)
+
+    def start(self, name, attrs=None):
+        self._indent()
+        self.xml.startElement(name, attrs or {})
+        self.depth += 1
+
+    def end(self, name):
+        self.depth -= 1
+        self._indent()
+        self.xml.endElement(name)
+
+    def element(self, name, text=None, attrs=None):
+        self._indent()
+        self.xml.startElement(name, attrs or {})
+        if text is not None:
+            self.xml.characters(str(text))
+        self.xml.endElement(name)
+
+
+def feed_key():
+    """
+    Key of the feed that should be served now.
+
+    It changes with the catalog version and with the day, because every offer
+    carries the nearest start date.
+    """
+    return f"{versions.get(FEED_VERSION)}-{datetime.utcnow().strftime('%Y%m%d')}"
+
+
+def feed_path(key):
+    return os.path.join(versions.cache_dir(), f'feed-{key}.xml')
+
+
+def write_feed(out):
+    """Stream the YML feed into the binary file-like object out"""
+    start_date = get_start_date()
+    lecture_url_prefix, lecture_url_suffix = url_for(
+        'main.lecture_detail', slug='__slug__', _external=True).split('__slug__', 1)
+    sections_url = url_for('main.sections', _external=True)
+
+    w = _Writer(out)
+    w.xml.startDocument()
+    w.xml.startElement('yml_catalog', {'date': datetime.utcnow().strftime("%Y-%m-%d %H:%M")})
+    w.depth = 1
+
+    w.start('shop')
+    w.element('name', "Биолекторий")
+    w.element('company', "Зоологический музей Московского государственного университета имени М. В. Ломоносова")
+    w.element('url', "https://biolectures.ru")
+    w.element('email', "biolectures@mail.ru")
+    w.element('picture', "https://biolectures.ru/static/img/logo.png")
+    w.element('description', "Лекции для всех возрастов")
+
+    # Добавляем валюту
+    w.start('currencies')
+    w.element('currency', attrs={'id': 'RUR', 'rate': '1'})
+    w.end('currencies')
+
+    # Добавляем наборы курсов (пример с категориями)
+    w.start('sets')
+    sections = (db.session.query(Section.id, Section.name)
+                .filter(Section.is_active == True)
+                .order_by(Section.id)
+                .execution_options(yield_per=FEED_CHUNK_SIZE))
+    for section in sections:
+        w.start('set', {'id': f's{section.id}'})
+        w.element('name', section.name)
+        w.element('url', sections_url)
+        w.end('set')
+    w.end('sets')
+
+    # Генерация предложений (offers) на основе лекций
+    w.start('offers')
+    lectures = (db.session.query(Lecture.id, Lecture.title, Lecture.slug, Lecture.description, Lecture.image)
+                .filter(Lecture.is_active == True)
+                .order_by(Lecture.id)
+                .execution_options(yield_per=FEED_CHUNK_SIZE))
+    for lecture in lectures:
+        w.start('offer', {'id': str(lecture.id)})
+        w.element('name', lecture.title or "Без названия")
+        w.element('url', f'{lecture_url_prefix}{lecture.slug}{lecture_url_suffix}')
+        w.element('categoryId', 10006)
+        w.element('set-ids', getattr(lecture, 'set_ids', "s1"))
+        w.element('price', getattr(lecture, 'price', 0))
+        w.element('currencyId', 'RUR')
+        # Дата ближайшего события
+        w.element('param', start_date, {'name': 'Ближайшая дата'})
+        w.element('param', getattr(lecture, 'duration', 1), {'name': 'Продолжительность', 'unit': 'час'})
+        w.element('description', lecture.description or "Описание отсутствует")
+        if lecture.image:
+            w.element('picture', f"https://biolectures.ru/static/uploads/lectures/{lecture.image}")
+        for name, value in OFFER_PARAMS:
+            w.element('param', value, {'name': name})
+        w.end('offer')
+    w.end('offers')
+
+    w.end('shop')
+    w.depth = 0
+    w.xml.ignorableWhitespace('\n')
+    w.xml.endElement('yml_catalog')
+    w.xml.endDocument()
+
+
+def build_feed(key):
+    """
+    Write feed-<key>.xml and its .gz sibling atomically and remove older feeds.
+
+    Must be called inside a request context (url_for needs a host).
+    """
+    path = feed_path(key)
+    tmp_suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    with open(path + tmp_suffix, 'wb') as raw, gzip.open(path + '.gz' + tmp_suffix, 'wb', compresslevel=9) as gz:
+        write_feed(_Tee(raw, gz))
+
+    # The .gz goes first so that a visible .xml always has its compressed sibling
+    os.replace(path + '.gz' + tmp_suffix, path + '.gz')
+    os.replace(path + tmp_suffix, path)
+
+    for old in glob.glob(os.path.join(os.path.dirname(path), 'feed-*.xml*')):
+        if old not in (path, path + '.gz') and not old.endswith('.tmp'):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return path
+
+
+def _build_in_context(app, key):
+    try:
+        with app.test_request_context(base_url=app.config['FEED_BASE_URL']):
+            build_feed(key)
+            app.logger.info(f"Feed {key} generated")
+    except Exception as e:
+        app.logger.error(f"Error generating feed.xml: {e}")
+    finally:
+        with _building_lock:
+            _building.discard(key)
+
+
+def schedule_build(key=None):
+    """Regenerate the feed in a background thread unless this process is already doing it"""
+    app = current_app._get_current_object()
+    key = key or feed_key()
+
+    with _building_lock:
+        if key in _building:
+            return
+        _building.add(key)
+
+    threading.Thread(target=_build_in_context, args=(app, key), daemon=True, name='feed-builder').start()
+
+
+def latest_feed_path():
+    """Most recently written feed file, if any"""
+    paths = glob.glob(os.path.join(versions.cache_dir(), 'feed-*.xml'))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def get_feed_path():
+    """
+    Path of the feed file to serve.
+
+    The current feed is served if it exists. Otherwise the previous one is
+    served while a background thread builds the new one; only the very first
+    request on an empty cache builds synchronously.
+    """
+    key = feed_key()
+    path = feed_path(key)
+    if os.path.exists(path):
+        return path
+
+    previous = latest_feed_path()
+    if previous is not None:
+        schedule_build(key)
+        return previous
+
+    app = current_app._get_current_object()
+    with app.test_request_context(base_url=app.config['FEED_BASE_URL']):
+        return build_feed(key)
+
+
+# Регенерация по изменению каталога, а не по запросу
+versions.subscribe(FEED_VERSION, schedule_build)
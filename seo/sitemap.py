@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from flask import current_app, request, url_for
+
+from app import db
+from cache import versions
+from models.models import Section, Lecture, SeoSettings
+
+# Имя версии, которая сбрасывается при изменении лекций, разделов или SEO-настроек
+SITEMAP_VERSION = 'sitemap'
+
+versions.track(SITEMAP_VERSION, Lecture, Section, SeoSettings)
+
+# Значения по умолчанию, если настройки SEO ещё не созданы
+DEFAULT_SETTINGS = {
+    'sitemap_include_lectures': True,
+    'sitemap_include_sections': True,
+    'sitemap_include_pages': True,
+    'sitemap_changefreq': 'weekly',
+    'sitemap_priority': 0.5,
+}
+
+# Собранные карты сайта в памяти процесса: {host: CachedSitemap}
+_memory = {}
+_lock = threading.Lock()
+
+
+class CachedSitemap:
+    """A rendered sitemap together with its validators"""
+
+    def __init__(self, version, body, last_modified):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = last_modified
+
+
+def _settings():
+    """Current sitemap settings as a dict. Never writes to the database."""
+    seo_settings = SeoSettings.query.first()
+    settings = dict(DEFAULT_SETTINGS)
+    if seo_settings:
+        for key, default in DEFAULT_SETTINGS.items():
+            value = getattr(seo_settings, key)
+            settings[key] = default if value is None else value
+    return settings
+
+
+def _url_builder(endpoint):
+    """
+    Build url_for once with a placeholder slug and return a cheap
+    slug -> absolute URL function for the per-row loop.
+    """
+    placeholder = '__slug__'
+    prefix, suffix = url_for(endpoint, slug=placeholder, _external=True).split(placeholder, 1)
+    return lambda slug: f'{prefix}{slug}{suffix}'
+
+
+def _url_entry(loc, lastmod, changefreq, priority):
+    return (
+        '  <url>\n'
+        f'    <loc>{escape(loc)}</loc>\n'
+        f'    <lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>\n'
+        f'    <changefreq>{changefreq}</changefreq>\n'
+        f'    <priority>{priority}</priority>\n'
+        '  </url>\n'
+    )
+
+
+def build_sitemap():
+    """Render sitemap.xml from the database. Must be called inside a request context."""
+    settings = _settings()
+    changefreq = settings['sitemap_changefreq']
+    priority = settings['sitemap_priority']
+    now = datetime.utcnow()
+
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n',
+        # Homepage gets higher priority
+        _url_entry(url_for('main.index', _external=True), now, changefreq, priority + 0.5),
+    ]
+
+    # Add sections if enabled
+    if settings['sitemap_include_sections']:
+        section_url = _url_builder('main.section_detail')
+        rows = db.session.query(Section.slug, Section.updated_at).filter(Section.is_active == True)
+        # Sections get higher priority than lectures
+        parts.extend(_url_entry(section_url(slug), updated_at or now, changefreq, priority + 0.3)
+                     for slug, updated_at in rows)
+
+    # Add lectures if enabled
+    if settings['sitemap_include_lectures']:
+        lecture_url = _url_builder('main.lecture_detail')
+        rows = db.session.query(Lecture.slug, Lecture.updated_at).filter(Lecture.is_active == True)
+        parts.extend(_url_entry(lecture_url(slug), updated_at or now, changefreq, priority)
+                     for slug, updated_at in rows)
+
+    # Add static pages if enabled
+    if settings['sitemap_include_pages']:
+        parts.append(_url_entry(url_for('main.sections', _external=True), now, changefreq, priority + 0.2))
+        parts.append(_url_entry(url_for('main.contacts', _external=True), now, changefreq, priority + 0.1))
+
+    parts.append('</urlset>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _disk_path(version, host):
+    host_key = hashlib.sha1(host.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(versions.cache_dir(), f'sitemap-{host_key}-{version}.xml')
+
+
+def _write_atomic(path, body):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+    # Remove files of older versions for the same host
+    prefix = os.path.basename(path).rsplit('-', 1)[0] + '-'
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.xml') and os.path.join(directory, name) != path:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def get_sitemap():
+    """
+    Return the CachedSitemap for the current host.
+
+    Lookup order: process memory, then the shared file written by any worker,
+    then a fresh build. A new build only happens after a commit changed
+    lectures, sections or SEO settings.
+    """
+    host = request.host_url
+    version = versions.get(SITEMAP_VERSION)
+
+    cached = _memory.get(host)
+    if cached is not None and cached.version == version:
+        return cached
+
+    with _lock:
+        cached = _memory.get(host)
+        if cached is not None and cached.version == version:
+            return cached
+
+        path = _disk_path(version, host)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            last_modified = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+        except FileNotFoundError:
+            body = build_sitemap()
+            last_modified = datetime.now(timezone.utc)
+            try:
+                _write_atomic(path, body)
+            except OSError as e:
+                current_app.logger.error(f"Error writing sitemap cache {path}: {e}")
+
+        cached = CachedSitemap(version, body, last_modified)
+        _memory[host] = cached
+        return cached
@@ -6,8 +6,12 @@ var chart_disk;
 var chart_net;
 var options_percent;
 var options_io;
+var chart_history;
+var options_history;
 
 var refresh_sec = 3.0;
+var history_sec = 600;
+var process_limit = 200;
 
 function initCharts() {
    data_memcpu = google.visualization.arrayToDataTable([
@@ -41,8 +45,17 @@ function initCharts() {
    chart_memcpu = new google.visualization.Gauge(document.getElementById('chart1'));
    chart_disk = new google.visualization.Gauge(document.getElementById('chart2'));
    chart_net = new google.visualization.Gauge(document.getElementById('chart3'));
+   chart_history = new google.visualization.LineChart(document.getElementById('chart4'));
+   options_history = {
+      height: 300, legend: { position: 'bottom' },
+      vAxis: { minValue: 0, maxValue: 100 }, hAxis: { format: 'HH:mm' }
+   };
    
    refreshCharts();
+   refreshHistory();
+   setInterval(function () {
+      refreshHistory();
+   }, 30000);
    refreshProcesses();
    setRefresh(refresh_sec);
 
@@ -50,6 +63,9 @@ function initCharts() {
    $('#refslider').val(refresh_sec);
    $(document).on('input', '#refslider', function() {
       setRefresh($(this).val())
+   });
+   $(document).on('change', '#proc_scope', function() {
+      refreshProcesses();
    });      
 }
 
@@ -76,10 +92,10 @@ function refreshCharts() {
          //console.dir(apidata);
          data_memcpu.setValue(0, 1, apidata.cpu);
          data_memcpu.setValue(1, 1, apidata.mem);
-         data_disk.setValue(0, 1, apidata.disk_read / (1024000*refresh_sec));
-         data_disk.setValue(1, 1, apidata.disk_write / (1024000*refresh_sec));
-         data_net.setValue(0, 1, apidata.net_sent / (1024000*refresh_sec));
-         data_net.setValue(1, 1, apidata.net_recv / (1024000*refresh_sec));
+         data_disk.setValue(0, 1, apidata.disk_read / 1024000);
+         data_disk.setValue(1, 1, apidata.disk_write / 1024000);
+         data_net.setValue(0, 1, apidata.net_sent / 1024000);
+         data_net.setValue(1, 1, apidata.net_recv / 1024000);
 
          chart_memcpu.draw(data_memcpu, options_percent);
          chart_disk.draw(data_disk, options_io);
@@ -91,14 +107,36 @@ function refreshCharts() {
    });
 }
 
+function refreshHistory() {
+   $.ajax({
+      url: '/api/monitor/history?seconds=' + history_sec,
+      type: 'GET',
+      dataType: 'json',
+      success: function (apidata) {
+         var data = new google.visualization.DataTable();
+         data.addColumn('datetime', 'Time');
+         data.addColumn('number', 'CPU %');
+         data.addColumn('number', 'Memory %');
+         for (var s = 0; s < apidata.samples.length; s++) {
+            var sample = apidata.samples[s];
+            data.addRow([new Date(sample.t * 1000), sample.cpu, sample.mem]);
+         }
+         chart_history.draw(data, options_history);
+      },
+      error: function (request, error) {
+         console.log("API Request: " + JSON.stringify(request));
+      }
+   });
+}
+
 function refreshProcesses() {
    $.ajax({
-      url: '/api/process',
+      url: '/api/process?sort=memory&limit=' + process_limit + '&scope=' + ($('#proc_scope').val() || 'all'),
       type: 'GET',
       dataType: 'json',
       success: function (apidata) {
          $('#process_tab').empty();
-         $('#proc_count').text(apidata.processes.length);
+         $('#proc_count').text(apidata.total);
          for(var p = 0; p < apidata.processes.length; p++) {
              $('#process_tab').append('<tr><td>'+apidata.processes[p].pid+'</td>'+
                 '<td>'+apidata.processes[p].name+'</td>'+
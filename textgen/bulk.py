@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import openai
+from flask import current_app
+
+from app import db
+from models.models import Lecture
+from textgen import cache
+
+# Ошибки, после которых запрос имеет смысл повторить
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+
+MODEL = 'gpt-4o-mini'
+TEMPERATURE = 0.7
+MAX_TOKENS = 300
+
+BACKOFF_BASE = 1.0  # Seconds before the first retry
+BACKOFF_MAX = 60.0
+
+# Rough upper bound of characters per token, used to reserve TPM budget before a request
+CHARS_PER_TOKEN = 2
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets shared by all worker threads.
+
+    Both budgets are token buckets refilled continuously. A request reserves
+    its estimated token count up front and the estimate is corrected with the
+    usage reported in the response.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens):
+        """Block until one request and tokens fit into the per-minute budgets"""
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max((1 - self._requests) * 60 / self.rpm, (tokens - self._tokens) * 60 / self.tpm)
+            time.sleep(wait)
+
+    def adjust(self, reserved, used):
+        """Return or charge the difference between the reserved and the actual token count"""
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens + reserved - used)
+
+
+def _retry_delay(error, attempt):
+    """Retry-After from the server if it sent one, exponential backoff with jitter otherwise"""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get('retry-after')), BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+def complete_with_retries(client, limiter, messages, max_retries, model=MODEL, temperature=TEMPERATURE,
+                          max_tokens=MAX_TOKENS):
+    """One chat completion within the rate limits, retried with backoff on transient errors"""
+    reserved = sum(len(m['content']) for m in messages) // CHARS_PER_TOKEN + max_tokens
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire(reserved)
+        try:
+            resp = client.chat.completions.create(model=model, messages=messages,
+                                                  temperature=temperature, max_tokens=max_tokens)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            time.sleep(_retry_delay(e, attempt))
+            continue
+
+        if resp.usage is not None:
+            limiter.adjust(reserved, resp.usage.total_tokens)
+        return resp.choices[0].message.content.strip()
+
+
+def _save_batch(results, cache_keys, now):
+    """Write a batch of {lecture_id: description} and cache the new ones in one transaction"""
+    lectures = Lecture.query.filter(Lecture.id.in_(list(results))).all()
+    for lecture in lectures:
+        lecture.description = results[lecture.id]
+        lecture.updated_at = now
+    for lecture_id, key in cache_keys.items():
+        cache.add(key, results[lecture_id], 'seo', MODEL)
+    db.session.commit()
+    return len(lectures)
+
+
+def regenerate_descriptions(stale_before, concurrency=None, rpm=None, tpm=None, batch_size=None, echo=None):
+    """
+    Regenerate SEO descriptions of active lectures last updated before stale_before.
+
+    Requests run in a thread pool of concurrency workers under the configured
+    RPM/TPM limits; results are committed every batch_size lectures through
+    the ORM, so cache versions and listeners see the changes. Must be called
+    inside an app context. Returns run statistics, including throughput in
+    lectures per minute.
+    """
+    from textgen.plugin import build_messages, client
+
+    config = current_app.config
+    concurrency = concurrency or config['TEXTGEN_CONCURRENCY']
+    batch_size = batch_size or config['TEXTGEN_COMMIT_BATCH']
+    max_retries = config['TEXTGEN_MAX_RETRIES']
+    limiter = RateLimiter(rpm or config['TEXTGEN_RPM'], tpm or config['TEXTGEN_TPM'])
+    log = echo or current_app.logger.info
+
+    # Only the columns the prompt needs; lectures without content have nothing to rewrite
+    lectures = db.session.query(Lecture.id, Lecture.title, Lecture.content).filter(
+        Lecture.updated_at <= stale_before,
+        Lecture.description.isnot(None),
+        Lecture.is_active == True,
+        Lecture.content.isnot(None),
+        Lecture.content != '',
+    ).order_by(Lecture.id).all()
+    db.session.rollback()
+
+    log(f"Found {len(lectures)} lectures to update descriptions")
+
+    # Retries are done here with the shared rate limiter, not inside the client
+    api = client.with_options(max_retries=0)
+    started = time.perf_counter()
+    updated = failed = 0
+    pending, pending_keys = {}, {}
+
+    def commit_pending():
+        nonlocal updated, failed, pending, pending_keys
+        try:
+            updated += _save_batch(pending, pending_keys, datetime.utcnow())
+        except Exception as e:
+            db.session.rollback()
+            failed += len(pending)
+            current_app.logger.error(f"Error saving lecture descriptions: {e}")
+        pending, pending_keys = {}, {}
+
+    # Lectures whose prompt is unchanged reuse the cached description without an API call
+    prompts = {lecture.id: build_messages(f"{lecture.title}. {lecture.content}", 'seo') for lecture in lectures}
+    keys = {lecture_id: cache.cache_key(messages, MODEL, TEMPERATURE, MAX_TOKENS)
+            for lecture_id, messages in prompts.items()}
+    cached = cache.lookup_many(set(keys.values()))
+    for lecture_id, key in keys.items():
+        if key in cached:
+            pending[lecture_id] = cached[key]
+    from_cache = len(pending)
+    log(f"{from_cache} descriptions served from the textgen cache")
+    if pending:
+        commit_pending()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='textgen') as pool:
+        futures = {
+            pool.submit(complete_with_retries, api, limiter, messages, max_retries): lecture_id
+            for lecture_id, messages in prompts.items() if keys[lecture_id] not in cached
+        }
+        for future in as_completed(futures):
+            lecture_id = futures[future]
+            try:
+                description = future.result()
+            except Exception as e:
+                failed += 1
+                current_app.logger.error(f"Error generating description for lecture ID {lecture_id}: {e}")
+                continue
+            if not description:
+                failed += 1
+                continue
+
+            pending[lecture_id] = description
+            pending_keys[lecture_id] = keys[lecture_id]
+            if len(pending) >= batch_size:
+                commit_pending()
+
+    if pending:
+        commit_pending()
+    cache.evict()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'lectures': len(lectures),
+        'updated': updated,
+        'from_cache': from_cache,
+        'failed': failed,
+        'seconds': round(elapsed, 2),
+        'lectures_per_minute': round(updated / elapsed * 60, 1) if elapsed > 0 else None,
+    }
+    log(f"Updated {updated} of {len(lectures)} descriptions in {elapsed:.1f}s "
+        f"({stats['lectures_per_minute']} lectures/min, {failed} failed)")
+    return stats
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from models.models import TextgenCache
+
+# Раз во сколько сохранений процесс чистит устаревшие и лишние записи
+EVICT_EVERY = 100
+
+_stores = 0
+_stores_lock = threading.Lock()
+
+
+def cache_key(messages, model, temperature, max_tokens):
+    """sha256 of everything that determines a completion: rendered prompt, model and sampling parameters"""
+    payload = json.dumps([messages, model, temperature, max_tokens], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _fresh_after():
+    return datetime.utcnow() - timedelta(seconds=current_app.config['TEXTGEN_CACHE_TTL'])
+
+
+def lookup_many(keys):
+    """{key: result} of the keys that have a cached result younger than the TTL"""
+    if not keys:
+        return {}
+    rows = db.session.query(TextgenCache.key, TextgenCache.result).filter(
+        TextgenCache.key.in_(list(keys)),
+        TextgenCache.created_at >= _fresh_after()
+    ).all()
+    if rows:
+        db.session.query(TextgenCache).filter(TextgenCache.key.in_([row.key for row in rows])).update(
+            {TextgenCache.hits: TextgenCache.hits + 1, TextgenCache.last_used_at: datetime.utcnow()},
+            synchronize_session=False)
+    return {row.key: row.result for row in rows}
+
+
+def lookup(key):
+    """Cached result for key or None; commits the hit counter"""
+    try:
+        result = lookup_many([key]).get(key)
+        db.session.commit()
+        return result
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error reading textgen cache: {e}")
+        return None
+
+
+def add(key, result, task_type=None, model=None):
+    """Add or replace a cached result in the current transaction"""
+    now = datetime.utcnow()
+    db.session.merge(TextgenCache(key=key, result=result, task_type=task_type, model=model,
+                                  hits=0, created_at=now, last_used_at=now))
+
+
+def store(key, result, task_type=None, model=None):
+    """Save a result and commit; evicts old rows every EVICT_EVERY stores of this process"""
+    global _stores
+    try:
+        add(key, result, task_type, model)
+        db.session.commit()
+    except Exception as e:
+        # A concurrent request may have stored the same key first
+        db.session.rollback()
+        current_app.logger.error(f"Error writing textgen cache: {e}")
+        return
+
+    with _stores_lock:
+        _stores += 1
+        due = _stores % EVICT_EVERY == 0
+    if due:
+        evict()
+
+
+def evict():
+    """Delete rows older than the TTL, then the least recently used rows above the size limit"""
+    try:
+        deleted = db.session.query(TextgenCache).filter(
+            TextgenCache.created_at < _fresh_after()
+        ).delete(synchronize_session=False)
+
+        size = current_app.config['TEXTGEN_CACHE_SIZE']
+        if db.session.query(TextgenCache.key).offset(size).limit(1).scalar() is not None:
+            kept = db.session.query(TextgenCache.key).order_by(
+                TextgenCache.last_used_at.desc(), TextgenCache.key).limit(size).subquery()
+            deleted += db.session.query(TextgenCache).filter(
+                TextgenCache.key.not_in(db.select(kept.c.key))
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+        return deleted
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error evicting textgen cache: {e}")
+        return 0
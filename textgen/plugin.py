@@ -4,8 +4,6 @@ import datetime
 from flask import Blueprint, current_app, request, jsonify
 from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from app import db
 from auth.views import admin_required
 
 load_dotenv()
@@ -24,7 +22,18 @@ PROMPT_TEMPLATES = {
     Текст не больше 350 символов. :\n\n{text}"""
 }
 
-def generate_text(text, task_type='friendly', model="gpt-4o-mini", temperature=0.7, max_tokens=300):
+SYSTEM_PROMPT = "Ты опытный редактор, оптимизирующий тексты под SEO. Пиши кратко, понятно и без структурных заголовков."
+
+def build_messages(text, task_type='friendly'):
+    """Chat messages for text rendered with the prompt template of task_type"""
+    # Get the appropriate prompt template or use friendly as default
+    prompt_template = PROMPT_TEMPLATES.get(task_type, PROMPT_TEMPLATES['friendly'])
+    prompt = prompt_template.format(text=text)
+    return [{"role": "user", "content": prompt},
+            {"role": "system", "content": SYSTEM_PROMPT}]
+
+def generate_text(text, task_type='friendly', model="gpt-4o-mini", temperature=0.7, max_tokens=300,
+                  bypass_cache=False):
     """
     Universal function to generate text using OpenAI API
 
@@ -34,95 +43,73 @@ def generate_text(text, task_type='friendly', model="gpt-4o-mini", temperature=0
         model (str): OpenAI model to use
         temperature (float): Creativity parameter (0.0-1.0)
         max_tokens (int): Maximum tokens in the response
+        bypass_cache (bool): Always call the API; the fresh result replaces the cached one
 
     Returns:
         str: Generated text or None if error
     """
+    from textgen import cache
+
     if not text:
         return None
 
-    # Get the appropriate prompt template or use friendly as default
-    prompt_template = PROMPT_TEMPLATES.get(task_type, PROMPT_TEMPLATES['friendly'])
-    prompt = prompt_template.format(text=text)
+    messages = build_messages(text, task_type)
+    key = cache.cache_key(messages, model, temperature, max_tokens)
+    if not bypass_cache:
+        cached = cache.lookup(key)
+        if cached is not None:
+            return cached
 
     try:
         resp = client.chat.completions.create(
             model=model,
-            messages=[{"role": "user", "content": prompt},
-                      {"role": "system", "content": "Ты опытный редактор, оптимизирующий тексты под SEO. Пиши кратко, понятно и без структурных заголовков."}],
+            messages=messages,
             temperature=temperature,
             max_tokens=max_tokens
         )
-        return resp.choices[0].message.content.strip()
+        result = resp.choices[0].message.content.strip()
     except Exception as e:
         current_app.logger.error(f"OpenAI error: {e}")
         return None
 
+    cache.store(key, result, task_type, model)
+    return result
+
 def _update_lecture_descriptions_impl():
     """
     Implementation of the update logic - should be called within an app context
     """
-    from models.models import Lecture
-
-    # Get current time
-    now = datetime.datetime.utcnow()
-
-    # Find lectures that need description update (updated more than 7 days ago)
-    seven_days_ago = now - datetime.timedelta(days=15)
-    lectures_to_update = Lecture.query.filter(
-        Lecture.updated_at <= seven_days_ago,
-        Lecture.description.isnot(None),
-        Lecture.is_active == True
-    ).all()
-
-    current_app.logger.info(f"Found {len(lectures_to_update)} lectures to update descriptions")
-
-    # Update each lecture description
-    for lecture in lectures_to_update:
-        if not lecture.content:
-            continue
-
-        # Generate new SEO-optimized description
-        new_description = generate_text(f"{lecture.title}. {lecture.content}", task_type='seo')
-
-        if new_description:
-            lecture.description = new_description
-            lecture.updated_at = now
+    from textgen.bulk import regenerate_descriptions
 
-            try:
-                db.session.commit()
-                current_app.logger.info(f"Updated description for lecture ID: {lecture.id}")
-            except Exception as e:
-                db.session.rollback()
-                current_app.logger.error(f"Error updating lecture ID {lecture.id}: {e}")
+    # Lectures that need description update (updated more than 15 days ago)
+    stale_before = datetime.datetime.utcnow() - datetime.timedelta(days=15)
+    return regenerate_descriptions(stale_before)
 
-def update_lecture_descriptions():
+def update_lecture_descriptions(app, job_id='update_lecture_descriptions'):
     """
     Update descriptions for lectures that haven't been updated in the last 7 days.
-    Ensures execution happens within an application context.
+    Runs in an application context of app, and only on the scheduler leader.
     """
-    from app import create_app
+    from textgen.scheduler import run_job
 
-    # Create app instance and push an application context
-    app = create_app()
-    with app.app_context():
-        _update_lecture_descriptions_impl()
+    run_job(app, job_id, _update_lecture_descriptions_impl)
 
 @textgen_bp.route('/rewrite', methods=['POST'])
 @admin_required
 def rewrite_text():
     """
-    Принимает JSON: { "base_text": "...", "task_type": "..." }
+    Принимает JSON: { "base_text": "...", "task_type": "...", "bypass_cache": false }
     Возвращает: { "result": "..." }
     """
     data = request.get_json()
     base = data.get("base_text", "").strip()
     task_type = data.get("task_type", "friendly")
+    bypass_cache = bool(data.get("bypass_cache", False))
 
     if not base:
         return jsonify({"error": "base_text is required"}), 400
 
-    result = generate_text(base, task_type)
+    result = generate_text(base, task_type, bypass_cache=bypass_cache)
 
     if result is None:
         return jsonify({"error": "AI generation failed"}), 500
@@ -138,15 +125,19 @@ def init_scheduler(state):
     # Schedule the update_lecture_descriptions function to run every 7 days
     # scheduler.add_job(
     #     func=update_lecture_descriptions,
+    #     args=(app,),
     #     trigger=IntervalTrigger(days=7),
     #     id='update_lecture_descriptions',
     #     name='Update lecture descriptions every 7 days',
     #     replace_existing=True
     # )
 
-    # Add a job to run once at startup to update any descriptions that need it
+    # Add a job to run once at startup to update any descriptions that need it.
+    # Every worker schedules it with the app that registered the blueprint;
+    # the scheduler leader is the only one that actually runs it
     scheduler.add_job(
         func=update_lecture_descriptions,
+        args=(app, 'initial_update_lecture_descriptions'),
         trigger='date',
         run_date=datetime.datetime.now() + datetime.timedelta(days=1),
         id='initial_update_lecture_descriptions',
@@ -0,0 +1,133 @@
+import os
+import socket
+import threading
+import time
+import traceback
+import zlib
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import db
+from cache import versions
+from models.models import JobRun
+
+# Ключ advisory lock, общий для всех процессов приложения
+LEADER_LOCK_KEY = zlib.crc32(b'biolectures:textgen-scheduler')
+
+
+class LeaderLock:
+    """
+    Cluster-wide lock that elects one process as the scheduler leader.
+
+    On PostgreSQL this is a session advisory lock held by a dedicated
+    connection for the life of the process. The server releases it when the
+    process or the connection dies, and the next worker that fires a job
+    takes over. Other databases (SQLite in development and tests) use an
+    exclusive lock on a file in CACHE_DIR, which covers all processes of one
+    host.
+
+    Session advisory locks need a real server session, so with
+    DB_PGBOUNCER=true DATABASE_URL must point at a session-pooled port.
+    """
+
+    def __init__(self, key=LEADER_LOCK_KEY):
+        self.key = key
+        self._connection = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Become or stay the leader; returns True if this process is the leader"""
+        with self._lock:
+            if db.engine.dialect.name == 'postgresql':
+                return self._acquire_advisory()
+            return self._acquire_file()
+
+    def _acquire_advisory(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT 1'))
+                self._connection.commit()
+                return True
+            except Exception:
+                # The connection and the lock with it are gone, compete for it again
+                self._connection.invalidate()
+                self._connection = None
+
+        connection = db.engine.connect()
+        try:
+            acquired = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def _acquire_file(self):
+        if self._file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows development server): a single process is assumed
+            return True
+
+        lock_file = open(os.path.join(versions.cache_dir(), 'scheduler.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+
+leader = LeaderLock()
+
+
+def run_job(app, job_id, func):
+    """
+    Run func() in an app context of app if this process is the scheduler leader.
+
+    Every worker schedules the same jobs, but only the leader executes them;
+    each execution is recorded in job_runs with its status and duration.
+    """
+    with app.app_context():
+        try:
+            if not leader.acquire():
+                app.logger.info(f"Skipping job {job_id}: another process is the scheduler leader")
+                return
+        except Exception as e:
+            app.logger.error(f"Scheduler leader election failed for job {job_id}: {e}")
+            return
+
+        try:
+            run = JobRun(job_id=job_id, status='running', host=f'{socket.gethostname()}:{os.getpid()}')
+            db.session.add(run)
+            db.session.commit()
+
+            started = time.perf_counter()
+            try:
+                func()
+                run.status = 'success'
+            except Exception as e:
+                db.session.rollback()
+                run.status = 'failed'
+                run.error = traceback.format_exc()
+                app.logger.error(f"Job {job_id} failed: {e}")
+
+            run.finished_at = datetime.utcnow()
+            run.duration = time.perf_counter() - started
+            db.session.commit()
+            app.logger.info(f"Job {job_id} finished with status {run.status} in {run.duration:.1f}s")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error recording run of job {job_id}: {e}")
+        finally:
+            db.session.remove()
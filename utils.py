@@ -1,6 +1,6 @@
 from flask import current_app, render_template
 from flask_mail import Message
-from app import mail
+from mail_transport import transport
 import secrets
 from datetime import datetime, timedelta
 
@@ -19,9 +19,9 @@ def generate_token():
     """Generate a secure token for email confirmation or password reset"""
     return secrets.token_urlsafe(32)
 
-def send_email(subject, recipients, html_body, text_body=None):
+def build_email(subject, recipients, html_body, text_body=None):
     """
-    Send an email with the given subject and body to the specified recipients.
+    Build an email message with an HTML body and a plain text alternative.
 
     Args:
         subject (str): The subject of the email
@@ -29,13 +29,48 @@ def send_email(subject, recipients, html_body, text_body=None):
         html_body (str): HTML content of the email
         text_body (str, optional): Plain text content of the email. Defaults to None.
     """
-    msg = Message(
+    return Message(
         subject=subject,
         recipients=recipients,
         html=html_body,
         body=text_body or html_body.replace('<br>', '\n').replace('</p>', '\n').replace('<p>', '')
     )
-    mail.send(msg)
+
+def send_emails(messages):
+    """
+    Send several messages over one SMTP session of the worker's pooled connection.
+
+    Args:
+        messages (list): Messages built with build_email
+    """
+    transport.send(messages)
+
+def queue_emails(messages):
+    """
+    Add messages to the email outbox in the current database transaction.
+
+    They are delivered by the background outbox worker once the caller commits,
+    and are discarded together with the transaction if it rolls back.
+
+    Args:
+        messages (list): Messages built with build_email
+    """
+    from mail_outbox import enqueue
+
+    for message in messages:
+        enqueue(message)
+
+def send_email(subject, recipients, html_body, text_body=None):
+    """
+    Send an email with the given subject and body to the specified recipients.
+
+    Args:
+        subject (str): The subject of the email
+        recipients (list): List of recipient email addresses
+        html_body (str): HTML content of the email
+        text_body (str, optional): Plain text content of the email. Defaults to None.
+    """
+    send_emails([build_email(subject, recipients, html_body, text_body)])
 
 def send_confirmation_email(user):
     """
@@ -95,7 +130,10 @@ def send_password_reset_email(user):
 
 def send_order_confirmation_email(order, user=None, is_new_user=False):
     """
-    Send an order confirmation email to a user.
+    Queue an order confirmation email to a user and a notification to the admin.
+
+    The emails are written to the outbox in the caller's transaction together
+    with the order confirmation token; the caller must commit.
 
     Args:
         order: The order object to send confirmation for
@@ -134,23 +172,23 @@ def send_order_confirmation_email(order, user=None, is_new_user=False):
                           confirmation_url=confirmation_url,
                           site_name=current_app.config['SITE_NAME'])
 
-    # Send email
-    send_email(
-        subject=f"Подтверждение заказа лекции - {current_app.config['SITE_NAME']}",
-        recipients=[order.email],
-        html_body=html
-    )
-
-    # Send email to admin
-    send_email(
-        subject=f"Новое сообщение с сайта - {current_app.config['SITE_NAME']}",
-        recipients=[admin_email],
-        html_body=admin_html
-    )
+    # The confirmation and the admin notification are delivered by the outbox worker
+    queue_emails([
+        build_email(
+            subject=f"Подтверждение заказа лекции - {current_app.config['SITE_NAME']}",
+            recipients=[order.email],
+            html_body=html
+        ),
+        build_email(
+            subject=f"Новое сообщение с сайта - {current_app.config['SITE_NAME']}",
+            recipients=[admin_email],
+            html_body=admin_html
+        ),
+    ])
 
 def send_contact_form_emails(form_data):
     """
-    Send emails for contact form submission.
+    Queue emails for contact form submission; the caller must commit.
 
     Args:
         form_data: Dictionary containing form data (name, email, phone, organization, message)
@@ -183,16 +221,16 @@ def send_contact_form_emails(form_data):
                                 site_name=current_app.config['SITE_NAME'],
                                 current_year=current_year)
 
-    # Send email to user
-    send_email(
-        subject=f"Спасибо за ваше сообщение - {current_app.config['SITE_NAME']}",
-        recipients=[form_data.get('email')],
-        html_body=user_html
-    )
-
-    # Send email to admin
-    send_email(
-        subject=f"Новое сообщение с сайта - {current_app.config['SITE_NAME']}",
-        recipients=[admin_email],
-        html_body=admin_html
-    )
+    # The email to the user and the admin notification are delivered by the outbox worker
+    queue_emails([
+        build_email(
+            subject=f"Спасибо за ваше сообщение - {current_app.config['SITE_NAME']}",
+            recipients=[form_data.get('email')],
+            html_body=user_html
+        ),
+        build_email(
+            subject=f"Новое сообщение с сайта - {current_app.config['SITE_NAME']}",
+            recipients=[admin_email],
+            html_body=admin_html
+        ),
+    ])
@@ -1,80 +1,81 @@
-from flask import jsonify, Blueprint
-import psutil
+from flask import jsonify, Blueprint, current_app, request
 
 from auth.views import admin_required
 
 api_bp = Blueprint('api', __name__)
-olddata = {}
-olddata["disk_write"] = 0
-olddata["disk_read"] = 0
-olddata["net_sent"] = 0
-olddata["net_recv"] = 0
 
 
 #
-# This route returns real time process information as a REST API
+# This route returns real time process information as a REST API:
+# ?scope=app limits it to this application's process tree,
+# ?sort=memory|cpu|threads|pid|name&limit=N returns the top N
 #
-@admin_required
 @api_bp.route("/api/process")
+@admin_required
 def api_process():
-    apidata = {}
-    try:
-        apidata["processes"] = []
-        for proc in psutil.process_iter():
-            try:
-                # pinfo = proc.as_dict(attrs=['pid', 'name', 'num_handles', 'num_threads', 'memory_percent', 'cpu_times'])
-                pinfo = proc.as_dict(
-                    attrs=["pid", "name", "memory_percent", "num_threads", "cpu_times"]
-                )
-            except psutil.NoSuchProcess:
-                pass
-            else:
-                apidata["processes"].append(pinfo)
-    except Exception:
-        pass
-
-    return jsonify(apidata)
+    from metrics.processes import SCOPES, list_processes
+
+    scope = request.args.get('scope', 'all')
+    if scope not in SCOPES:
+        scope = 'all'
+    limit = request.args.get('limit', type=int)
+    processes, total = list_processes(scope, request.args.get('sort'), limit if limit and limit > 0 else None)
+    return jsonify({"processes": processes, "total": total})
 
 
 #
-# This route returns real time system metrics as a REST API
+# This route returns the newest system metrics sample as a REST API
 #
-@admin_required
 @api_bp.route("/api/monitor")
+@admin_required
 def api_monitor():
-    apidata = {}
-    apidata["cpu"] = psutil.cpu_percent(interval=0.9)
-    apidata["mem"] = psutil.virtual_memory().percent
-    apidata["disk"] = psutil.disk_usage("/").percent
-
-    try:
-        netio = psutil.net_io_counters()
-        apidata["net_sent"] = (
-            0 if olddata["net_sent"] == 0 else netio.bytes_sent - olddata["net_sent"]
-        )
-        olddata["net_sent"] = netio.bytes_sent
-        apidata["net_recv"] = (
-            0 if olddata["net_recv"] == 0 else netio.bytes_recv - olddata["net_recv"]
-        )
-        olddata["net_recv"] = netio.bytes_recv
-    except Exception:
-        apidata["net_sent"] = -1
-        apidata["net_recv"] = -1
-
-    try:
-        diskio = psutil.disk_io_counters()
-        apidata["disk_write"] = (
-            0
-            if olddata["disk_write"] == 0
-            else diskio.write_bytes - olddata["disk_write"]
-        )
-        olddata["disk_write"] = diskio.write_bytes
-        apidata["disk_read"] = (
-            0 if olddata["disk_read"] == 0 else diskio.read_bytes - olddata["disk_read"]
-        )
-        olddata["disk_read"] = diskio.read_bytes
-    except Exception:
-        apidata["disk_write"] = -1
-        apidata["disk_read"] = -1
-
-    return jsonify(apidata)
+    from metrics.sampler import latest
+
+    return jsonify(latest())
+
+
+#
+# This route returns system metrics samples of the last ?seconds=N for charts
+#
+@api_bp.route("/api/monitor/history")
+@admin_required
+def api_monitor_history():
+    from metrics.sampler import history
+
+    limit = current_app.config['METRICS_HISTORY'] * current_app.config['METRICS_INTERVAL']
+    seconds = min(max(request.args.get('seconds', 600, type=int), 0), limit)
+    return jsonify({"interval": current_app.config['METRICS_INTERVAL'], "samples": history(seconds)})
+
+
+#
+# This route returns spaCy model load state and timings
+#
+@api_bp.route("/api/nlp/models")
+@admin_required
+def api_nlp_models():
+    from nlp.registry import registry
+
+    return jsonify(registry.stats())
+
+
+#
+# This route returns page cache hit/miss counters of this worker
+#
+@api_bp.route("/api/cache/stats")
+@admin_required
+def api_cache_stats():
+    from cache.pages import page_cache
+
+    return jsonify({"pages": page_cache.stats()})
+
+
+#
+# This route returns connection pool occupancy and checkout wait times of this worker
+#
+@api_bp.route("/api/db/pool")
+@admin_required
+def api_db_pool():
+    from app import db
+    from db_pool import pool_status
+
+    return jsonify(pool_status(db.engine))
@@ -1,17 +1,23 @@
-from xml.sax.saxutils import escape
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, session, jsonify, Response, send_file
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, session, jsonify, Response
-from sqlalchemy import func
-
-from models.models import Section, Lecture, Contact, OrderForm, MenuItem, HomeBlock, User, Role, SeoSettings
+from models.models import Section, Lecture, Contact, OrderForm, MenuItem, HomeBlock, User, Role, SeoSettings, LECTURE_POSITION
 from app import db
 from auth.views import login_required
 import os
+import base64
 from werkzeug.utils import secure_filename
 import uuid
 from datetime import datetime
 
-from utils import get_start_date
+from seo.sitemap import get_sitemap
+from seo.feed import get_feed_path
+from cache.conditional import conditional_page, lecture_state, section_state
+from cache.pages import cached_page
+from cache.related import related_lectures
+from cache.slugs import slug_criterion
+from images.derivatives import image_srcset, process_upload
 
 # Create main blueprint
 user_bp = Blueprint('main', __name__)
@@ -19,6 +25,7 @@ user_bp = Blueprint('main', __name__)
 @user_bp.route('/')
 @user_bp.route('/index')
 @user_bp.route('/index.html')
+@cached_page
 def index():
     """Homepage view"""
     # Get active home blocks ordered by position
@@ -40,6 +47,7 @@ def index():
     return render_template('index.html', blocks=blocks)
 
 @user_bp.route('/sections')
+@cached_page
 def sections():
     """View all sections"""
     sections_list = []
@@ -56,16 +64,22 @@ def sections():
 
 
 @user_bp.route('/section/<slug>')
+@conditional_page(section_state)
+@cached_page
 def section_detail(slug):
     """View lectures in a section"""
     section = None
     lectures = []
 
+    # Slugs are stored in lowercase, old mixed-case links move permanently
+    if slug != slug.lower():
+        return redirect(url_for('main.section_detail', slug=slug.lower()), 301)
+
     try:
         # Safely encode the slug
         safe_slug = slug.encode('ascii', 'ignore').decode('ascii')
         section = Section.query.filter(
-            func.lower(Section.slug) == safe_slug.lower(),
+            slug_criterion(Section, safe_slug),
             Section.is_active == True
         ).first_or_404()
 
@@ -85,39 +99,97 @@ def section_detail(slug):
 
     return render_template('section_detail.html', section=section, lectures=lectures)
 
+# Поля лекции, которые можно запросить через ?fields=
+LECTURE_FIELDS = ('id', 'title', 'subtitle', 'description', 'content', 'image', 'slug', 'order')
+# Поля по умолчанию: всё, что нужно карточке, без тяжёлого HTML в content
+LECTURE_FIELDS_COMPACT = ('id', 'title', 'subtitle', 'description', 'image', 'slug', 'order')
+LECTURES_PAGE_DEFAULT = 5
+LECTURES_PAGE_MAX = 50
+
+
+def _encode_cursor(order, lecture_id):
+    return base64.urlsafe_b64encode(f'{order}:{lecture_id}'.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    order, lecture_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+    return int(order), int(lecture_id)
+
+
+def _lecture_json(row, fields):
+    """Requested lecture fields; the image comes with srcsets of its resized derivatives"""
+    data = {field: getattr(row, field) for field in fields}
+    if 'image' in fields:
+        data['image_srcset'] = {'webp': image_srcset('lectures', row.image, 'WEBP'),
+                                'jpeg': image_srcset('lectures', row.image, 'JPEG')}
+    return data
+
+
 @user_bp.route('/lectures_section/<slug>')
 def load_lectures_section(slug):
-    """API возвращает раздел и связанные с ним лекции с поддержкой пагинации"""
+    """
+    API возвращает раздел и связанные с ним лекции с поддержкой пагинации.
+
+    Query parameters:
+        cursor: next_cursor from the previous response (keyset pagination on position, id)
+        page: legacy offset pagination, used only when no cursor is given
+        limit: page size, capped at LECTURES_PAGE_MAX
+        fields: comma-separated lecture fields, compact set without content by default
+        count: 0 to skip counting all lectures of the section
+    """
     try:
         # Получение параметров пагинации
-        page = int(request.args.get('page', 1))  # Номер страницы, по умолчанию 1
-        limit = int(request.args.get('limit', 5))  # Лимит лекций на одной странице, по умолчанию 5
-        offset = (page - 1) * limit  # Смещение в выборке
+        limit = min(max(request.args.get('limit', LECTURES_PAGE_DEFAULT, type=int), 1), LECTURES_PAGE_MAX)
+        cursor = request.args.get('cursor')
+        page = request.args.get('page', 1, type=int) if not cursor else None
+        with_count = request.args.get('count', '1') != '0'
+
+        fields = LECTURE_FIELDS_COMPACT
+        if request.args.get('fields'):
+            fields = tuple(f for f in request.args['fields'].split(',') if f in LECTURE_FIELDS)
+
+        try:
+            after = _decode_cursor(cursor) if cursor else None
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({"error": "Invalid cursor"}), 400
 
         # Найти раздел по slug
-        section = Section.query.filter(
-            func.lower(Section.slug) == slug.lower(),
+        section = db.session.query(Section.id, Section.name, Section.description, Section.image).filter(
+            slug_criterion(Section, slug),
             Section.is_active == True
         ).first_or_404()
 
-        # Найти все активные лекции, связанные с этим разделом
-        lectures_query = Lecture.query.filter_by(section_id=section.id, is_active=True).order_by(Lecture.order)
-
-        # Применить лимит и смещение для пагинации
-        total_lectures = lectures_query.count()  # Общее количество лекций
-        lectures = lectures_query.offset(offset).limit(limit).all()
-
-        # Если лекции закончились, вернуть пустой список, чтобы скрыть кнопку "Загрузить ещё"
-        if not lectures:
-            return jsonify({
-                'section': {
-                    'id': section.id,
-                    'title': section.name,
-                    'description': section.description,
-                    'image': section.image
-                },
-                'lectures': []
-            })
+        # Only the requested columns, plus position and id for the cursor
+        columns = [getattr(Lecture, f) for f in fields if f not in ('id', 'order')]
+        lectures_query = db.session.query(Lecture.id, Lecture.order, LECTURE_POSITION.label('position'), *columns).filter(
+            Lecture.section_id == section.id,
+            Lecture.is_active == True
+        ).order_by(LECTURE_POSITION, Lecture.id)
+
+        if after is not None:
+            lectures_query = lectures_query.filter(tuple_(LECTURE_POSITION, Lecture.id) > tuple_(*after))
+        elif page and page > 1:
+            lectures_query = lectures_query.offset((page - 1) * limit)
+
+        # One extra row tells whether there is a next page without counting
+        rows = lectures_query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        pagination = {
+            'limit': limit,
+            'has_more': has_more,  # Есть ли ещё лекции
+            'next_cursor': _encode_cursor(rows[-1].position, rows[-1].id) if has_more else None,
+        }
+        if page:
+            pagination['page'] = page
+        if with_count:
+            # Общее количество лекций
+            pagination['total'] = db.session.query(func.count(Lecture.id)).filter(
+                Lecture.section_id == section.id,
+                Lecture.is_active == True
+            ).scalar()
 
         # Отправить данные в формате JSON
         return jsonify({
@@ -127,25 +199,8 @@ def load_lectures_section(slug):
                 'description': section.description,
                 'image': section.image
             },
-            'lectures': [
-                {
-                    'id': lecture.id,
-                    'title': lecture.title,
-                    'subtitle': lecture.subtitle,
-                    'description': lecture.description,
-                    'content': lecture.content,
-                    'image': lecture.image,
-                    'slug': lecture.slug,
-                    'order': lecture.order,
-                }
-                for lecture in lectures
-            ],
-            'pagination': {
-                'total': total_lectures,  # Общее количество лекций
-                'page': page,  # Текущая страница
-                'limit': limit,  # Лимит на загрузку
-                'has_more': offset + limit < total_lectures  # Есть ли ещё лекции
-            }
+            'lectures': [_lecture_json(row, fields) for row in rows],
+            'pagination': pagination
         })
 
     except Exception as e:
@@ -156,18 +211,25 @@ def load_lectures_section(slug):
 
 
 @user_bp.route('/lecture/<slug>')
+@conditional_page(lecture_state)
+@cached_page
 def lecture_detail(slug):
     """View a specific lecture"""
     lecture = None
+    related = ()
+
+    # Slugs are stored in lowercase, old mixed-case links move permanently
+    if slug != slug.lower():
+        return redirect(url_for('main.lecture_detail', slug=slug.lower()), 301)
 
     try:
         # Safely encode the slug
         safe_slug = slug.encode('ascii', 'ignore').decode('ascii')
-        lecture = Lecture.query.filter(
-            func.lower(Lecture.slug) == safe_slug.lower(),
+        lecture = Lecture.query.options(joinedload(Lecture.section)).filter(
+            slug_criterion(Lecture, safe_slug),
             Lecture.is_active == True
         ).first_or_404()
-
+        related = related_lectures(lecture)
 
     except UnicodeDecodeError as e:
         print(f"UnicodeDecodeError when querying Lecture with slug '{slug}': {str(e)}")
@@ -176,9 +238,10 @@ def lecture_detail(slug):
         print(f"Error querying Lecture with slug '{slug}': {str(e)}")
         return render_template('404.html'), 404
 
-    return render_template('lecture_detail.html', lecture=lecture)
+    return render_template('lecture_detail.html', lecture=lecture, related_lectures=related)
 
 @user_bp.route('/contacts')
+@cached_page
 def contacts():
     """View contact information"""
     contacts_list = []
@@ -279,6 +342,9 @@ def upload_avatar():
         file_path = os.path.join(uploads_dir, unique_filename)
         file.save(file_path)
 
+        # Resized WebP/JPEG copies for srcset
+        process_upload(file_path)
+
         # Update user avatar in database
         user.avatar = unique_filename
         db.session.commit()
@@ -425,12 +491,14 @@ def contact_form():
                 'message': message
             }
 
-            # Send emails
+            # Queue emails, they are delivered in the background after the commit
             try:
                 send_contact_form_emails(form_data)
+                db.session.commit()
                 flash('Спасибо за ваше сообщение! Мы свяжемся с вами в ближайшее время.', 'success')
             except Exception as e:
-                print(f"Error sending contact form emails: {str(e)}")
+                db.session.rollback()
+                print(f"Error queueing contact form emails: {str(e)}")
                 flash('Произошла ошибка при отправке сообщения. Пожалуйста, попробуйте еще раз позже.', 'danger')
 
             return redirect(url_for('main.index'))
@@ -486,16 +554,12 @@ def order_lecture(lecture_id):
                     )
 
                     db.session.add(order)
-                    db.session.commit()
+                    db.session.flush()
 
-                    # Send order confirmation email
-                    try:
-                        send_order_confirmation_email(order, user)
-                        db.session.commit()
-                        flash('Заказ успешно создан! На ваш email отправлено письмо с подтверждением.', 'success')
-                    except Exception as e:
-                        print(f"Error sending order confirmation email: {str(e)}")
-                        flash('Заказ создан, но возникла проблема при отправке письма с подтверждением.', 'warning')
+                    # The order and its emails are committed together, delivery happens in the background
+                    send_order_confirmation_email(order, user)
+                    db.session.commit()
+                    flash('Заказ успешно создан! На ваш email отправлено письмо с подтверждением.', 'success')
 
                 else:
                     # Check if user with this email already exists
@@ -516,16 +580,12 @@ def order_lecture(lecture_id):
                         )
 
                         db.session.add(order)
-                        db.session.commit()
+                        db.session.flush()
 
-                        # Send order confirmation email
-                        try:
-                            send_order_confirmation_email(order, existing_user)
-                            db.session.commit()
-                            flash('Заказ успешно создан! На ваш email отправлено письмо с подтверждением.', 'success')
-                        except Exception as e:
-                            print(f"Error sending order confirmation email: {str(e)}")
-                            flash('Заказ создан, но возникла проблема при отправке письма с подтверждением.', 'warning')
+                        # The order and its emails are committed together, delivery happens in the background
+                        send_order_confirmation_email(order, existing_user)
+                        db.session.commit()
+                        flash('Заказ успешно создан! На ваш email отправлено письмо с подтверждением.', 'success')
 
                     else:
                         # Create new user
@@ -556,7 +616,7 @@ def order_lecture(lecture_id):
                             new_user.roles.append(user_role)
 
                         db.session.add(new_user)
-                        db.session.commit()
+                        db.session.flush()
 
                         # Create order for new user
                         order = OrderForm(
@@ -572,22 +632,20 @@ def order_lecture(lecture_id):
                         )
 
                         db.session.add(order)
-                        db.session.commit()
+                        db.session.flush()
 
-                        # Send order confirmation email for new user
-                        try:
-                            send_order_confirmation_email(order, new_user, is_new_user=True)
-                            db.session.commit()
-                            flash('Заказ успешно создан! На ваш email отправлено письмо с подтверждением и данными для входа в систему.', 'success')
-                        except Exception as e:
-                            print(f"Error sending order confirmation email: {str(e)}")
-                            flash('Заказ создан, но возникла проблема при отправке письма с подтверждением.', 'warning')
+                        # The user, the order and the emails are committed together, delivery happens in the background
+                        send_order_confirmation_email(order, new_user, is_new_user=True)
+                        db.session.commit()
+                        flash('Заказ успешно создан! На ваш email отправлено письмо с подтверждением и данными для входа в систему.', 'success')
 
                 return redirect(url_for('main.lecture_detail', slug=lecture.slug))
             except UnicodeDecodeError as e:
+                db.session.rollback()
                 print(f"UnicodeDecodeError when processing order form: {str(e)}")
                 flash('Ошибка при обработке заказа. Пожалуйста, попробуйте еще раз.', 'error')
             except Exception as e:
+                db.session.rollback()
                 print(f"Error processing order form: {str(e)}")
                 flash('Ошибка при обработке заказа. Пожалуйста, попробуйте еще раз.', 'error')
 
@@ -602,77 +660,16 @@ def order_lecture(lecture_id):
 
 @user_bp.route('/sitemap.xml')
 def sitemap():
-    """Generate and serve sitemap.xml"""
+    """Serve sitemap.xml from cache, rebuilt only after catalog or SEO changes"""
     try:
-        # Get SEO settings
-        seo_settings = SeoSettings.query.first()
+        cached = get_sitemap()
 
-        # If no settings exist, create default settings
-        if not seo_settings:
-            seo_settings = SeoSettings()
-            db.session.add(seo_settings)
-            db.session.commit()
-
-        # Update last updated timestamp
-        seo_settings.sitemap_last_updated = datetime.utcnow()
-        db.session.commit()
-
-        # Start XML content
-        sitemap_xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        sitemap_xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-
-        # Add homepage
-        sitemap_xml += '  <url>\n'
-        sitemap_xml += f'    <loc>{url_for("main.index", _external=True)}</loc>\n'
-        sitemap_xml += f'    <lastmod>{datetime.utcnow().strftime("%Y-%m-%d")}</lastmod>\n'
-        sitemap_xml += f'    <changefreq>{seo_settings.sitemap_changefreq}</changefreq>\n'
-        sitemap_xml += f'    <priority>{seo_settings.sitemap_priority + 0.5}</priority>\n'  # Homepage gets higher priority
-        sitemap_xml += '  </url>\n'
-
-        # Add sections if enabled
-        if seo_settings.sitemap_include_sections:
-            sections = Section.query.filter_by(is_active=True).all()
-            for section in sections:
-                sitemap_xml += '  <url>\n'
-                sitemap_xml += f'    <loc>{url_for("main.section_detail", slug=section.slug, _external=True)}</loc>\n'
-                sitemap_xml += f'    <lastmod>{section.updated_at.strftime("%Y-%m-%d")}</lastmod>\n'
-                sitemap_xml += f'    <changefreq>{seo_settings.sitemap_changefreq}</changefreq>\n'
-                sitemap_xml += f'    <priority>{seo_settings.sitemap_priority + 0.3}</priority>\n'  # Sections get higher priority than lectures
-                sitemap_xml += '  </url>\n'
-
-        # Add lectures if enabled
-        if seo_settings.sitemap_include_lectures:
-            lectures = Lecture.query.filter_by(is_active=True).all()
-            for lecture in lectures:
-                sitemap_xml += '  <url>\n'
-                sitemap_xml += f'    <loc>{url_for("main.lecture_detail", slug=lecture.slug, _external=True)}</loc>\n'
-                sitemap_xml += f'    <lastmod>{lecture.updated_at.strftime("%Y-%m-%d")}</lastmod>\n'
-                sitemap_xml += f'    <changefreq>{seo_settings.sitemap_changefreq}</changefreq>\n'
-                sitemap_xml += f'    <priority>{seo_settings.sitemap_priority}</priority>\n'
-                sitemap_xml += '  </url>\n'
-
-        # Add static pages if enabled
-        if seo_settings.sitemap_include_pages:
-            # Add sections page
-            sitemap_xml += '  <url>\n'
-            sitemap_xml += f'    <loc>{url_for("main.sections", _external=True)}</loc>\n'
-            sitemap_xml += f'    <lastmod>{datetime.utcnow().strftime("%Y-%m-%d")}</lastmod>\n'
-            sitemap_xml += f'    <changefreq>{seo_settings.sitemap_changefreq}</changefreq>\n'
-            sitemap_xml += f'    <priority>{seo_settings.sitemap_priority + 0.2}</priority>\n'
-            sitemap_xml += '  </url>\n'
-
-            # Add contacts page
-            sitemap_xml += '  <url>\n'
-            sitemap_xml += f'    <loc>{url_for("main.contacts", _external=True)}</loc>\n'
-            sitemap_xml += f'    <lastmod>{datetime.utcnow().strftime("%Y-%m-%d")}</lastmod>\n'
-            sitemap_xml += f'    <changefreq>{seo_settings.sitemap_changefreq}</changefreq>\n'
-            sitemap_xml += f'    <priority>{seo_settings.sitemap_priority + 0.1}</priority>\n'
-            sitemap_xml += '  </url>\n'
-
-        # Close XML
-        sitemap_xml += '</urlset>'
-
-        return Response(sitemap_xml, mimetype='application/xml')
+        response = Response(cached.body, mimetype='application/xml')
+        response.set_etag(cached.etag)
+        response.last_modified = cached.last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True  # Always revalidate, 304 is cheap
+        return response.make_conditional(request)
 
     except Exception as e:
         print(f"Error generating sitemap: {str(e)}")
@@ -716,100 +713,20 @@ def robots_txt():
 
 @user_bp.route('/feed.xml')
 def generate_feed():
-    """Generate and serve the YML feed."""
+    """Serve the pre-rendered YML feed, gzip-compressed when the client accepts it."""
     try:
-        # Получаем список активных лекций и категорий
-        lectures = Lecture.query.filter_by(is_active=True).all()
-        sections = Section.query.filter_by(is_active=True).all()
-
-        # Генерация XML заголовка
-        feed_xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        feed_xml += '<yml_catalog date="{date}">\n'.format(date=datetime.utcnow().strftime("%Y-%m-%d %H:%M"))
-        feed_xml += '  <shop>\n'
-        feed_xml += '    <name>{}</name>\n'.format(escape("Биолекторий"))
-        feed_xml += '    <company>{}</company>\n'.format(escape("Зоологический музей Московского государственного университета имени М. В. Ломоносова"))
-        feed_xml += '    <url>{}</url>\n'.format("https://biolectures.ru")
-        feed_xml += '    <email>{}</email>\n'.format("biolectures@mail.ru")
-        feed_xml += '    <picture>{}</picture>\n'.format(f"https://biolectures.ru/static/img/logo.png")
-        feed_xml += '    <description>{}</description>\n'.format(escape("Лекции для всех возрастов"))
-
-        # Добавляем валюту
-        feed_xml += '    <currencies>\n'
-        feed_xml += '      <currency id="RUR" rate="1"/>\n'
-        feed_xml += '    </currencies>\n'
-
-        # Добавляем наборы курсов (пример с категориями)
-        feed_xml += '    <sets>\n'
-        for section in sections:
-            feed_xml += '      <set id="s{id}">\n'.format(id=section.id)
-            feed_xml += '        <name>{}</name>\n'.format(escape(section.name))
-            feed_xml += '        <url>{}</url>\n'.format(
-                url_for('main.sections', _external=True)
-            )
-            feed_xml += '      </set>\n'
-        feed_xml += '    </sets>\n'
-
-        # Генерация предложений (offers) на основе лекций
-        feed_xml += '    <offers>\n'
-        for lecture in lectures:
-            feed_xml += '      <offer id="{id}">\n'.format(id=lecture.id)
-            # Название лекции
-            title = lecture.title or "Без названия"
-            feed_xml += '        <name>{}</name>\n'.format(escape(title))
-            # URL-адрес лекции
-            feed_xml += '        <url>{}</url>\n'.format(
-                url_for('main.lecture_detail', slug=lecture.slug, _external=True)
-            )
-
-            # Категория
-            feed_xml += '        <categoryId>{}</categoryId>\n'.format(10006)
-
-            # Указываем id наборов лекций
-            set_ids = getattr(lecture, 'set_ids', "s1")
-            feed_xml += '        <set-ids>{}</set-ids>\n'.format(escape(set_ids))
-
-            # Цена лекции
-            price = getattr(lecture, 'price', 0)
-            feed_xml += '        <price>{}</price>\n'.format(price)
-            feed_xml += '        <currencyId>RUR</currencyId>\n'
-
-            # Дата ближайшего события
-            feed_xml += '        <param name="Ближайшая дата">{}</param>\n'.format(get_start_date())
-            duration = getattr(lecture, 'duration', 1)
-            feed_xml += '        <param name="Продолжительность" unit="час">{}</param>\n'.format(duration)
-
-            # Описание
-            description = lecture.description or "Описание отсутствует"
-            feed_xml += '        <description>{}</description>\n'.format(escape(description))
-            # Дополнительное изображение для лекции
-            if lecture.image:
-                feed_xml += '        <picture>{}</picture>\n'.format(f"https://biolectures.ru/static/uploads/lectures/{lecture.image}")
-
-            # Обучающие параметры
-            feed_xml += '        <param name="Формат обучения">В группе с наставником</param>\n'
-
-
-            feed_xml += '        <param name="Есть вебинары">false</param>\n'
-            feed_xml += '        <param name="Есть домашние работы">false</param>\n'
-            feed_xml += '        <param name="Есть видеоуроки">false</param>\n'
-            feed_xml += '        <param name="Есть текстовые уроки">false</param>\n'
-            feed_xml += '        <param name="Есть тренажеры">false</param>\n'
-            feed_xml += '        <param name="Есть сообщество">false</param>\n'
-
-            feed_xml += '        <param name="Сложность">Для новичков</param>\n'
-            feed_xml += '        <param name="Тип обучения">Курс</param>\n'
-            feed_xml += '        <param name="План">Вводная часть, Основная часть, Практическая часть, Заключение</param>\n'
-
-            feed_xml += '      </offer>\n'
-
-        # Закрытие секции предложений
-        feed_xml += '    </offers>\n'
-
-        # Закрытие XML
-        feed_xml += '  </shop>\n'
-        feed_xml += '</yml_catalog>'
-
-        return Response(feed_xml, mimetype='application/xml')
+        path = get_feed_path()
+
+        if request.accept_encodings['gzip'] > 0 and os.path.exists(path + '.gz'):
+            response = send_file(path + '.gz', mimetype='application/xml', conditional=True,
+                                 etag=True, max_age=0)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_file(path, mimetype='application/xml', conditional=True,
+                                 etag=True, max_age=0)
+
+        response.vary.add('Accept-Encoding')
+        return response
 
     except Exception as e:
         print(f"Error generating feed.xml: {str(e)}")